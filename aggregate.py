@@ -0,0 +1,174 @@
+import pandas as pd
+import numpy as np
+from gradeconvert import decode_scores
+from enums import GradeCodes, Cols
+
+# columns that identify a single assignment. Multiple assignments in the same
+# class can have the same name (!), so the due date is part of the key.
+ASSIGNMENT_KEY_COLS = [
+    Cols.AssignmentName.value,
+    Cols.ClassName.value,
+    Cols.AssignmentDue.value,
+]
+
+# per-student columns that make no sense once assignments are aggregated
+DROPPED_COLS = (
+    Cols.Score.value,
+    Cols.ScorePossible.value,
+    Cols.StudentId.value,
+    Cols.StudentLastname.value,
+    Cols.StudentFirstname.value,
+)
+
+# count columns, in the order aggregate_assignments has always returned them
+COUNT_COLS = [
+    "NumAssignments",
+    "NumMissing",
+    "NumIncomplete",
+    "NumExcused",
+    "NumZero",
+    "NumBlank",
+]
+
+def get_percentage_column(df):
+    """df -> float Series of percentage grades, NaN where the grade is ignored.
+
+    Invalid scores (unparseable, negative, or out of a zero or blank
+    ScorePossible) are ignored too, instead of failing the whole extract:
+    data_checks.check_scores lists them in each report's score anomalies.
+    """
+    decoded = decode_scores(df[Cols.Score.value], df[Cols.ScorePossible.value])
+    return pd.Series(decoded.percentages, index=df.index)
+
+# count column of each grade code, in the order of get_grade_codes' codes
+GRADE_CODE_COUNT_COLS = [
+    "NumMissing",
+    "NumIncomplete",
+    "NumExcused",
+    "NumZero",
+    "NumBlank",
+]
+
+def get_grade_codes(df):
+    """df -> int ndarray: position in GRADE_CODE_COUNT_COLS of each score's
+    grade code, -1 for scores counted by none of them"""
+    s = df[Cols.Score.value]
+    return np.select([
+            s == GradeCodes.Missing.value,
+            s == GradeCodes.Incomplete.value,
+            s == GradeCodes.Excused.value,
+            (s == "0") | (s == 0),
+            s == "",
+        ], range(len(GRADE_CODE_COUNT_COLS)), default=-1)
+
+def tally_grade_codes(group_ids, num_groups, grade_codes):
+    """Counts every grade code of every group with one bincount.
+
+    Positional args:
+    group_ids: int[] -- group of each score, from 0 to num_groups - 1.
+        Scores with a negative group aren't counted.
+    num_groups: int
+    grade_codes: int[] -- from get_grade_codes
+
+    Returns:
+    int[num_groups, len(GRADE_CODE_COUNT_COLS)]
+    """
+    num_codes = len(GRADE_CODE_COUNT_COLS)
+    is_counted = (group_ids >= 0) & (grade_codes >= 0)
+    flat_codes = group_ids[is_counted] * num_codes + grade_codes[is_counted]
+    return np.bincount(flat_codes, minlength=num_groups * num_codes).reshape(num_groups, num_codes)
+
+# running totals kept per assignment while folding in student assignments
+SCORE_SUM_COL = "ScoreSum"
+SCORE_COUNT_COL = "ScoreCount"
+
+def get_kept_cols():
+    """-> non-key columns carried over from the first student assignment"""
+    return [col.value for col in Cols
+                if col.value not in DROPPED_COLS
+                and col.value not in ASSIGNMENT_KEY_COLS]
+
+def partial_aggregate_assignments(grade_df_subset):
+    """Folds student assignments into per-assignment running totals.
+
+    The percentage column and the grade codes are built once for the whole
+    frame. Every per-assignment column is computed in a single groupby().agg
+    pass, and the grade codes of every assignment are tallied at once.
+    Partial results for different chunks of an extract can be merged with
+    combine_partial_aggregates.
+
+    Positional args:
+    grade_df_subset: df of student assignments, with the columns in Cols.
+
+    Returns:
+    df with one row per (ASGName, ClassName, AssignmentDue), holding the sum
+    and count of percentage grades and the grade code counts.
+    """
+    kept_cols = get_kept_cols()
+    df = grade_df_subset[ASSIGNMENT_KEY_COLS + kept_cols].copy()
+    # This is either a float percentage score or NaN.
+    # If NaN, the student's score was marked for 'ignoring' -- ie, either
+    # with GradeCodes.Excused, GradeCodes.Incomplete or empty ("") -- or
+    # is invalid
+    percentages = get_percentage_column(grade_df_subset)
+    df[SCORE_SUM_COL] = percentages
+    df[SCORE_COUNT_COL] = percentages.notnull().astype(int)
+    df["NumAssignments"] = 1
+
+    # we expect the non-key columns to best case be the same across the
+    # group, worst case to not matter if slightly different.
+    aggregations = {col: "first" for col in kept_cols}
+    aggregations.update({col: "sum" for col in [SCORE_SUM_COL, SCORE_COUNT_COL, "NumAssignments"]})
+    grouped = df.groupby(ASSIGNMENT_KEY_COLS)
+    aggregated_df = grouped.agg(aggregations)
+    # groups are numbered in the order agg returns them; rows with a NaN
+    # key are in no group
+    group_ids = grouped.ngroup().fillna(-1).astype(int).values
+    grade_code_counts = tally_grade_codes(group_ids, grouped.ngroups, get_grade_codes(grade_df_subset))
+    for i, col in enumerate(GRADE_CODE_COUNT_COLS):
+        aggregated_df[col] = grade_code_counts[:, i]
+    return aggregated_df[kept_cols + [SCORE_SUM_COL, SCORE_COUNT_COL] + COUNT_COLS].reset_index()
+
+def combine_partial_aggregates(partial_dfs):
+    """Merges partial_aggregate_assignments results into one partial result."""
+    partial_dfs = [df for df in partial_dfs if not df.empty]
+    if len(partial_dfs) == 0:
+        return pd.DataFrame()
+    if len(partial_dfs) == 1:
+        return partial_dfs[0]
+    aggregations = {col: "first" for col in get_kept_cols()}
+    aggregations.update({col: "sum" for col in [SCORE_SUM_COL, SCORE_COUNT_COL] + COUNT_COLS})
+    return (pd.concat(partial_dfs, ignore_index=True)
+              .groupby(ASSIGNMENT_KEY_COLS).agg(aggregations).reset_index())
+
+def finalize_aggregate(partial_df):
+    """Turns running totals into the averaged assignments of aggregate_assignments."""
+    if partial_df.empty:
+        return pd.DataFrame()
+
+    aggregated_df = partial_df.copy()
+    # NaN if every student's score was ignored
+    aggregated_df[Cols.Score.value] = (aggregated_df[SCORE_SUM_COL] /
+                                       aggregated_df[SCORE_COUNT_COL].where(aggregated_df[SCORE_COUNT_COL] > 0))
+    aggregated_df[Cols.ScorePossible.value] = float(100)
+
+    # keep the column order of the row-wise implementation
+    assignment_cols = [Cols.Score.value, Cols.ScorePossible.value] + COUNT_COLS
+    assignment_cols += [col.value for col in Cols
+                            if col.value not in DROPPED_COLS]
+    return aggregated_df[assignment_cols]
+
+def aggregate_assignments(grade_df_subset):
+    """Folds individual student assignments into averaged assignments.
+
+    Vectorized equivalent of gbutils.aggregate_assignments.
+
+    Positional args:
+    grade_df_subset: df of student assignments, with the columns in Cols.
+
+    Returns:
+    df with one row per (ASGName, ClassName, AssignmentDue).
+    """
+    if grade_df_subset.empty:
+        return pd.DataFrame()
+    return finalize_aggregate(partial_aggregate_assignments(grade_df_subset))
@@ -0,0 +1,103 @@
+import unittest
+import warnings
+import gbutils_test_mockdata
+import numpy as np
+import pandas as pd
+from enums import Cols, GradeCodes
+import gbutils
+from aggregate import (
+        aggregate_assignments,
+        partial_aggregate_assignments,
+        combine_partial_aggregates,
+        finalize_aggregate,
+        get_grade_codes,
+        tally_grade_codes,
+        GRADE_CODE_COUNT_COLS
+)
+
+def rowwise_aggregate_assignments(df):
+    # gbutils.aggregate_assignments grows its output with DataFrame.append,
+    # which newer pandas warns about.
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return gbutils.aggregate_assignments(df)
+
+class AggregateAssignments(unittest.TestCase):
+
+    def assertMatchesRowwise(self, df):
+        expected_output = rowwise_aggregate_assignments(df)
+        actual_output = aggregate_assignments(df)
+        pd.testing.assert_frame_equal(actual_output, expected_output, check_dtype=False)
+
+    def test__should_match_rowwise_implementation(self):
+        self.assertMatchesRowwise(gbutils_test_mockdata.mock_gradebook_df)
+
+    def test__should_match_rowwise_implementation_with_several_assignments(self):
+        mock_gradebook_df = gbutils_test_mockdata.mock_gradebook_df
+        # same rows, due on another date, so they become separate assignments
+        other_due_date = mock_gradebook_df.copy()
+        other_due_date[Cols.AssignmentDue.value] = "other"
+        other_due_date[Cols.Score.value] = list(reversed(other_due_date[Cols.Score.value]))
+        df = pd.concat([mock_gradebook_df, other_due_date], ignore_index=True)
+        self.assertMatchesRowwise(df)
+
+    def test__should_match_rowwise_implementation_when_all_grades_ignored(self):
+        df = gbutils_test_mockdata.mock_gradebook_df.copy()
+        df[Cols.Score.value] = "Exc"
+        self.assertMatchesRowwise(df)
+
+    def test__should_accurately_average_assignments(self):
+        mock_gradebook_df = gbutils_test_mockdata.mock_gradebook_df
+        expected_output = gbutils_test_mockdata.mock_gradebook_df_aggregated_assignments
+        actual_output = aggregate_assignments(mock_gradebook_df)
+
+        actual_output_dicts = actual_output.to_dict("records")
+        expected_output_dicts = expected_output.to_dict("records")
+
+        self.assertEqual(len(actual_output_dicts), len(expected_output_dicts))
+        for i, act_dict in enumerate(actual_output_dicts):
+            exp_dict = expected_output_dicts[i]
+            self.maxDiff = None
+            self.assertDictEqual(act_dict, exp_dict)
+
+    def test__should_return_empty_df_for_empty_input(self):
+        df = gbutils_test_mockdata.mock_gradebook_df.iloc[0:0]
+        self.assertTrue(aggregate_assignments(df).empty)
+
+    def test__should_count_missing_and_incomplete_separately(self):
+        df = gbutils_test_mockdata.mock_gradebook_df.copy()
+        scores = [GradeCodes.Missing.value] * 3 + [GradeCodes.Incomplete.value] * 2
+        df[Cols.Score.value] = scores + ["50"] * (len(df) - len(scores))
+        for output in (aggregate_assignments(df), rowwise_aggregate_assignments(df)):
+            self.assertEqual(output["NumMissing"].sum(), 3)
+            self.assertEqual(output["NumIncomplete"].sum(), 2)
+
+class TallyGradeCodes(unittest.TestCase):
+
+    def test__should_count_each_code_per_group(self):
+        df = pd.DataFrame({Cols.Score.value: ["Msg", "Inc", "Msg", "0", 0, "", "Exc", "85", "A"]})
+        group_ids = np.array([0, 0, 1, 1, 1, 1, -1, 0, 1])
+        counts = pd.DataFrame(tally_grade_codes(group_ids, 2, get_grade_codes(df)),
+                              columns=GRADE_CODE_COUNT_COLS)
+        self.assertEqual(counts.to_dict("records"), [
+                {"NumMissing": 1, "NumIncomplete": 1, "NumExcused": 0, "NumZero": 0, "NumBlank": 0},
+                {"NumMissing": 1, "NumIncomplete": 0, "NumExcused": 0, "NumZero": 2, "NumBlank": 1},
+            ])
+
+class CombinePartialAggregates(unittest.TestCase):
+
+    def test__should_match_aggregating_whole_frame(self):
+        df = gbutils_test_mockdata.mock_gradebook_df
+        # split so that both assignments span two chunks
+        chunks = [df.iloc[0:3], df.iloc[3:7], df.iloc[7:]]
+        partial_df = pd.DataFrame()
+        for chunk in chunks:
+            partial_df = combine_partial_aggregates([partial_df, partial_aggregate_assignments(chunk)])
+
+        pd.testing.assert_frame_equal(finalize_aggregate(partial_df), aggregate_assignments(df))
+
+    def test__should_return_empty_df_without_partials(self):
+        self.assertTrue(finalize_aggregate(combine_partial_aggregates([pd.DataFrame()])).empty)
+
+if __name__ == "__main__":
+    unittest.main()
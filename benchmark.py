@@ -0,0 +1,130 @@
+"""Benchmarks the report pipeline on synthetic extracts.
+
+For each scale (number of schools, see synthetic_extracts), generates the
+extracts once, then times with the instrumentation module:
+    * loading each data_access frame, including aggregate_assignments
+    * each render_* stage and the HTML / PDF rendering of every report
+    * end-to-end generation of each report ("total")
+
+Results are appended to RESULTS_FILEPATH, one JSON object per scale and run,
+and compared with the previous run at the same scale.
+
+    $ python benchmark.py --scales 1 10 100 --max-reports 20
+"""
+import os
+import os.path as path
+import argparse
+import json
+import subprocess
+import time
+
+import data_access
+import extract_cache
+import instrumentation
+import create_gradebook_summary as gb_summary
+from synthetic_extracts import generate_extracts
+
+BENCHMARK_DIR = "./benchmarks"
+RESULTS_FILEPATH = path.join(BENCHMARK_DIR, "results.jsonl")
+DEFAULT_SCALES = (1, 10, 100)
+
+def get_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def use_synthetic_extracts(scale, regenerate=False):
+    """Generates extracts for scale if needed and points data_access at them."""
+    source_dir = path.join(BENCHMARK_DIR, "source")
+    date = "scale_{}".format(scale)
+    extract_dir = path.join(source_dir, date)
+    if regenerate or not path.isdir(extract_dir):
+        print("Generating extracts for scale {}...".format(scale))
+        generate_extracts(extract_dir, num_schools=scale)
+
+    data_access.use_extract_dir(extract_dir)
+    # measure a cold load, even if this scale was loaded before
+    data_access.get_dataset().invalidate()
+
+def run_benchmark(scale, max_reports=20, regenerate=False):
+    """Times loading and report generation at one scale. Returns the result dict."""
+    use_synthetic_extracts(scale, regenerate)
+    # measure a cold start: parse the CSVs instead of reading the extract cache
+    extract_cache.ENABLED = False
+    gb_summary.OUTPUT_DIR = path.join(BENCHMARK_DIR, "reports")
+    gb_summary.IMAGE_DIR = path.join(BENCHMARK_DIR, "images")
+    os.makedirs(gb_summary.OUTPUT_DIR, exist_ok=True)
+    os.makedirs(gb_summary.IMAGE_DIR, exist_ok=True)
+    instrumentation.configure(enabled=True)
+    instrumentation.reset()
+
+    with instrumentation.stage("load all"):
+        partitions = data_access.get_report_partitions()
+        data_access.get_categories_df()
+
+    jobs = partitions.keys()[:max_reports]
+    for teacher, homeroom in jobs:
+        with instrumentation.report(gb_summary.get_report_name(teacher, homeroom)):
+            gb_summary.create_gradebook_summary(teacher, homeroom)
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": get_commit(),
+        "scale": scale,
+        "num_assignments": len(data_access.get_assignments_df()),
+        "num_possible_reports": len(partitions.keys()),
+        "num_reports": len(jobs),
+        "stages": instrumentation.summarize(instrumentation.pop_records()),
+    }
+
+def load_results(filepath=RESULTS_FILEPATH):
+    if not path.isfile(filepath):
+        return []
+    with open(filepath) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def save_result(result, filepath=RESULTS_FILEPATH):
+    os.makedirs(path.dirname(filepath), exist_ok=True)
+    with open(filepath, "a") as f:
+        f.write(json.dumps(result) + "\n")
+
+def print_result(result, previous_result=None):
+    """Prints stage timings, with the change since previous_result if given."""
+    previous_stages = {}
+    if previous_result is not None:
+        previous_stages = {s["stage"]: s for s in previous_result["stages"]}
+        print("Scale {}x, compared with {} ({}):".format(result["scale"],
+                                                          previous_result["timestamp"],
+                                                          previous_result["commit"]))
+    else:
+        print("Scale {}x:".format(result["scale"]))
+
+    print("  {:<40} {:>6} {:>10} {:>10} {:>12} {:>12} {:>8}".format(
+        "stage", "count", "wall_s", "cpu_s", "rss_chg_mb", "proc_peak_mb", "change"))
+    for stage in result["stages"]:
+        change = ""
+        previous_stage = previous_stages.get(stage["stage"])
+        if previous_stage is not None and previous_stage["wall_s"] > 0:
+            change = "{:+.0%}".format(stage["wall_s"] / previous_stage["wall_s"] - 1)
+        print("  {:<40} {:>6} {:>10.3f} {:>10.3f} {:>12.1f} {:>12.1f} {:>8}".format(
+            stage["stage"], stage["count"], stage["wall_s"], stage["cpu_s"],
+            stage["max_rss_change_mb"] or 0, stage["process_peak_rss_mb"] or 0, change))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the report pipeline on synthetic extracts.")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES,
+                        help="sizes to run, in schools (default: 1 10 100)")
+    parser.add_argument("--max-reports", type=int, default=20,
+                        help="number of reports rendered per scale (default: 20)")
+    parser.add_argument("--regenerate", action="store_true",
+                        help="regenerate the synthetic extracts even if they exist")
+    args = parser.parse_args()
+
+    previous_results = load_results()
+    for scale in args.scales:
+        result = run_benchmark(scale, max_reports=args.max_reports, regenerate=args.regenerate)
+        previous_result = next((r for r in reversed(previous_results) if r["scale"] == scale), None)
+        print_result(result, previous_result)
+        save_result(result)
@@ -1,30 +1,110 @@
 from enums import LetterGradeCutoffs, Cols, GradeCodes
-from gbutils import calculate_negative_impact
-from gradeconvert import to_letter_grade
+from gbutils import calculate_negative_impacts, get_lettergrade_histogram
+from gradeconvert import decode_scores, join_scores, letter_grade_counts, LETTER_GRADES
 import pandas as pd
 import numpy as np
+import os
 import os.path as path
-from data_access import get_grade_df, get_assignments_df, get_unused_cats_df
-from plots import create_lettergrade_breakdown_diagram
+import data_access
+from data_access import get_report_partitions, ReportPartitions
+import importlib
+import traceback
 
-import jinja2
-import weasyprint
+import data_checks
+import report_manifest
+import report_rendering
+import instrumentation
 
-def render_grade_breakdown_diagrams(grade_df):
-    """df -> html"""
+OUTPUT_DIR = os.environ.get("GB_OUTPUT_DIR", "./reports")
+IMAGE_DIR = "./images/"
+# "svg" or "png": one image with every subject, inlined in the report as a
+# data URI. "files": one PNG per subject, saved to IMAGE_DIR.
+DIAGRAM_FORMAT = os.environ.get("GB_DIAGRAM_FORMAT", "svg")
+DIAGRAM_FORMATS = ("svg", "png", "files")
+# columns a report's rows are selected by
+REPORT_KEY_COLS = ReportPartitions.PARTITION_COLS
+NUM_NEGATIVE_IMPACT_ASSIGNMENTS = 5
+# class of the table rows highlighted in red, see the report template
+FLAGGED_ROW_CLASS = "flagged"
+# width of each subject's chart in the report
+DIAGRAM_WIDTH_PX = 200
+# "svg": draw charts as hand-built SVG, without importing matplotlib.
+# "matplotlib": draw them with matplotlib, also used for png charts, which
+# the svg backend can't draw.
+CHART_BACKEND = os.environ.get("GB_CHART_BACKEND", "svg")
+CHART_BACKENDS = {"svg": "svg_plots", "matplotlib": "plots"}
+
+def get_chart_backend():
+    """-> the module drawing charts, imported on first use"""
+    backend = CHART_BACKEND
+    if backend not in CHART_BACKENDS:
+        raise ValueError("Unknown chart backend {}".format(backend))
+    if DIAGRAM_FORMAT != "svg":
+        backend = "matplotlib"
+    return importlib.import_module(CHART_BACKENDS[backend])
+
+def decode_quarter_avgs(grade_df):
+    """df -> DecodedScores of the quarter averages"""
+    decoded_grades = decode_scores(join_scores(grade_df["QuarterAvg"], grade_df["QuarterAvgCode"]), 100)
+    if decoded_grades.invalid_rows:
+        raise ValueError("Bad QuarterAvg in rows {}".format(decoded_grades.invalid_rows))
+    return decoded_grades
+
+def split_by_report(df, keys, level=False):
+    """Splits a frame computed for many reports into each report's rows.
+
+    Positional args:
+    df: df -- with the report key in REPORT_KEY_COLS columns, or with
+        level=True, in the first two index levels, which are dropped.
+    keys: (teacher_fullname, homeroom)[] -- reports to split out.
+
+    Returns:
+    {(teacher_fullname, homeroom): df} with an entry, maybe empty, per key
+    """
+    if level:
+        empty_df = df.iloc[0:0].droplevel([0, 1])
+        report_dfs = {} if df.empty else {key: report_df.droplevel([0, 1])
+                                            for key, report_df in df.groupby(level=[0, 1], sort=False, observed=True)}
+    else:
+        empty_df = df.iloc[0:0]
+        report_dfs = {} if df.empty else dict(iter(df.groupby(REPORT_KEY_COLS, sort=False, observed=True)))
+    return {key: report_dfs.get(key, empty_df) for key in keys}
+
+def get_grade_counts_by_subject(grade_df, by=()):
+    """Counts letter grades per subject.
 
-    IMAGE_DIR = "./images/"
-    # group filtered df by subject
-    gdf = grade_df.groupby("SubjectName")
-    teacher_fullname = grade_df.iloc[1]["TeacherFullname"]
-    # create images
+    With by, a list of columns (eg REPORT_KEY_COLS), counts them per
+    subject and per value of those columns instead.
+
+    Returns:
+    df with one row per (*by, SubjectName) and one column per letter grade
+    """
+    decoded_grades = decode_quarter_avgs(grade_df)
+    if not by:
+        return get_lettergrade_histogram(decoded_grades.percentages, grade_df["SubjectName"])
+    groups = grade_df.groupby(list(by) + ["SubjectName"], sort=True, observed=True)
+    counts = letter_grade_counts(decoded_grades.percentages, groups.ngroup().values, groups.ngroups)
+    # observed groups of categoricals aren't always in sorted order
+    return pd.DataFrame(counts, index=groups.size().index, columns=LETTER_GRADES).sort_index()
+
+def draw_grade_breakdown_diagrams(grade_counts_by_subject, teacher_fullname, homeroom):
+    """df of letter grade counts per subject -> html"""
+    charts = get_chart_backend()
+    if DIAGRAM_FORMAT != "files":
+        # draw every subject into one in-memory image
+        sprite_url = charts.create_lettergrade_breakdown_sprite(grade_counts_by_subject, image_format=DIAGRAM_FORMAT)
+        sprite_width = DIAGRAM_WIDTH_PX * min(max(len(grade_counts_by_subject), 1), charts.SPRITE_COLUMNS)
+        return """<div width="100%"><img style="width: {0}px;" src="{1}"/></div>""".format(sprite_width, sprite_url)
+
+    # create images. Reports can be rendered in parallel, so image names
+    # must be unique per report.
     diagram_urls = []
-    for subject_name, group in gdf:
-        diagram_url = path.join(IMAGE_DIR, "{} {}.png".format(subject_name, teacher_fullname))
+    for subject_name, grade_counts in grade_counts_by_subject.iterrows():
+        diagram_url = path.join(IMAGE_DIR, "{} {} {}.png".format(subject_name, teacher_fullname, homeroom))
         diagram_url = diagram_url.replace(" ", "_")
-        success, err = create_lettergrade_breakdown_diagram(grades=group["QuarterAvg"],
-                                                         output_url=diagram_url,
-                                                         label=subject_name)
+        success, err = charts.create_lettergrade_breakdown_diagram(letter_grade_counts=grade_counts.values,
+                                                                output_url=diagram_url,
+                                                                label=subject_name)
         if success:
             diagram_urls.append(diagram_url)
         else:
@@ -34,23 +114,37 @@ def render_grade_breakdown_diagrams(grade_df):
     def create_html(diagram_urls):
         html = """<div width="100%">"""
         for url in diagram_urls:
-            html += """<img style="width: 200px;" src="{0}"/>""".format(url)
+            html += """<img style="width: {0}px;" src="{1}"/>""".format(DIAGRAM_WIDTH_PX, url)
         html += """</div>"""
         return html
 
     return create_html(diagram_urls)
 
-def render_failing_students_table(grade_df):
+@instrumentation.timed("render_grade_breakdown_diagrams")
+def render_grade_breakdown_diagrams(grade_df):
+    """df -> html"""
+
+    teacher_fullname = grade_df.iloc[0]["TeacherFullname"]
+    homeroom = grade_df.iloc[0]["Homeroom"]
+    # count letter grades for every subject at once
+    grade_counts_by_subject = get_grade_counts_by_subject(grade_df)
+    return draw_grade_breakdown_diagrams(grade_counts_by_subject, teacher_fullname, homeroom)
+
+def get_failing_students(grade_df):
+    """df -> rows of students with an F, sorted by ClassName"""
+    # filter df by students with scores of F
+    decoded_grades = decode_quarter_avgs(grade_df)
+    df = grade_df[decoded_grades.letters == "F"]
+    # group by className. The sort is stable, so a report's rows are in the
+    # same order whether they are sorted on their own or with every report.
+    df = df.sort_values("ClassName", kind="mergesort")
+    return df
+
+def format_failing_students_table(failing_students):
     """df -> html"""
-    def get_failing_students_by_class(df):
-        """df -> grouped df"""
-        # filter df by students with scores of F
-        df = df[df.apply(lambda row: to_letter_grade(row["QuarterAvg"], 100) == "F", axis=1)]
-        # group by className
-        df = df.sort_values("ClassName")
-        return df
-
-    failing_students = get_failing_students_by_class(grade_df)
+    # show letter grades and codes where there are no numeric averages
+    failing_students = failing_students.assign(QuarterAvg=join_scores(failing_students["QuarterAvg"],
+                                                                      failing_students["QuarterAvgCode"]))
     # keep only the columns we want to render
     failing_students = failing_students[[
         "ClassName",
@@ -62,6 +156,12 @@ def render_failing_students_table(grade_df):
     failing_students = failing_students.set_index("ClassName")
     return failing_students.to_html()
 
+@instrumentation.timed("render_failing_students_table")
+def render_failing_students_table(grade_df):
+    """df -> html"""
+    return format_failing_students_table(get_failing_students(grade_df))
+
+@instrumentation.timed("render_unused_categories_df")
 def render_unused_categories_df(unused_cats_df):
     """df -> html"""
     unused_cats_df = unused_cats_df.set_index("SubjectName")
@@ -73,42 +173,39 @@ def render_unused_categories_df(unused_cats_df):
     unused_cats_df = unused_cats_df.drop_duplicates()
     return unused_cats_df.to_html()
 
-def render_negative_impact_assignments(assignments_df):
-    """df -> html"""
-    NUM_ASSIGNMENTS_TO_DISPLAY = 5
+def get_negative_impact_assignments(assignments_df, by=()):
+    """Returns the NUM_NEGATIVE_IMPACT_ASSIGNMENTS assignments with the highest
+    negative impact in each subject.
+
+    With by, a list of columns (eg REPORT_KEY_COLS), returns them for each
+    subject and value of those columns instead.
+    """
+    by = list(by)
     # drop all assignments with None, Excused, Incomplete or "" grades.
-    assignments_df = assignments_df[~assignments_df["Score"].isin(("", None, GradeCodes.Excused, GradeCodes.Incomplete))]
-    # group assignments by subject name
-    assignments_df_by_subject = assignments_df.groupby("SubjectName", as_index=False)
-    # go through assignments and calculate negative impact scores, adding new column for them
-    def create_negative_impact_column(df):
-        df["Negative Impact"] = df.apply(lambda row: calculate_negative_impact(
-                                                        row[Cols.Score.value], 
-                                                        row[Cols.ScorePossible.value], 
-                                                        row[Cols.CategoryWeight.value],
-                                                        len(assignments_df[ 
-                                                            (assignments_df["CategoryName"] == row["CategoryName"]) &
-                                                            (assignments_df["ClassName"] == row["ClassName"])
-                                                        ].index),
-                                                    ), axis=1)
-        df["Negative Impact"] = df["Negative Impact"].astype(float)
-        df["Score"] = df["Score"].astype(float)
-        # get total number of assignments in this category
-        df["Total # Assignments in Category"] = df.apply(lambda row: len(assignments_df[ 
-                                                (assignments_df["CategoryName"] == row["CategoryName"]) &
-                                                (assignments_df["ClassName"] == row["ClassName"])
-                                          ].index), axis=1)
-        # keep only the top 5 highest impact assignments
-        df.sort_values(["Negative Impact"], ascending=False, inplace=True)
-        df = df.head(NUM_ASSIGNMENTS_TO_DISPLAY)
-        return df
-
-    output_df = pd.DataFrame()
-    for name, group in assignments_df_by_subject:
-        df_to_append = create_negative_impact_column(group)
-        output_df = output_df.append(df_to_append, ignore_index=True)
-    #assignments_df = assignments_df_by_subject.apply(create_negative_impact_column)
-    output_df.reset_index(inplace=True, drop=True)
+    assignments_df = assignments_df[assignments_df["Score"].notnull() &
+                                    ~assignments_df["Score"].isin(("", GradeCodes.Excused.value, GradeCodes.Incomplete.value))]
+    assignments_df = assignments_df.copy()
+    assignments_df["Score"] = assignments_df["Score"].astype(float)
+    # get total number of assignments in each assignment's category
+    assignments_df["Total # Assignments in Category"] = (assignments_df
+            .groupby(by + ["CategoryName", "ClassName"], observed=True)["ASGName"]
+            .transform("size"))
+    # calculate negative impact scores for every assignment at once
+    assignments_df["Negative Impact"] = calculate_negative_impacts(
+            assignments_df[Cols.Score.value],
+            assignments_df[Cols.ScorePossible.value],
+            assignments_df[Cols.CategoryWeight.value],
+            assignments_df["Total # Assignments in Category"])
+    # keep only the top 5 highest impact assignments per subject
+    return (assignments_df
+            .sort_values(by + ["SubjectName", "Negative Impact"],
+                         ascending=[True] * (len(by) + 1) + [False], kind="mergesort")
+            .groupby(by + ["SubjectName"], observed=True)
+            .head(NUM_NEGATIVE_IMPACT_ASSIGNMENTS))
+
+def format_negative_impact_assignments(output_df):
+    """df -> html"""
+    output_df = output_df.reset_index(drop=True)
     # rename cols 
     output_df["Avg Score"] = output_df["Score"]
     output_df["Assignment"] = output_df["ASGName"]
@@ -127,9 +224,22 @@ def render_negative_impact_assignments(assignments_df):
     ]]
     return output_df.to_html()
 
-def render_category_table(assignments_df, unused_cats_df):
+@instrumentation.timed("render_negative_impact_assignments")
+def render_negative_impact_assignments(assignments_df):
+    """df -> html"""
+    return format_negative_impact_assignments(get_negative_impact_assignments(assignments_df))
+
+def get_category_aggregates(assignments_df, by=()):
+    """Sums up the assignments of each category of each subject.
+
+    With by, a list of columns (eg REPORT_KEY_COLS), sums them up per
+    value of those columns too.
+
+    Returns:
+    df indexed by (*by, SubjectName, CategoryName)
+    """
     # filter the cols we want to keep
-    assignments_df = assignments_df[[
+    assignments_df = assignments_df[list(by) + [
             "SubjectName",
             "CategoryName",
             "CategoryWeight",
@@ -142,42 +252,55 @@ def render_category_table(assignments_df, unused_cats_df):
             "NumZero",
         ]]
 
-    #print(assignments_df)
-    assignments_df["Score"] = assignments_df["Score"].astype(float)
-    assignments_pivot = assignments_df.pivot_table(index=["SubjectName"], 
-                                                   columns=["CategoryName"],
-                                                   aggfunc={
-                                                        "CategoryWeight": 'first',
-                                                        "Score": np.mean,
-                                                        "NumAssignments": lambda row: row.size,
-                                                        "NumBlank": np.sum,
-                                                        "NumExcused": np.sum,
-                                                        "NumIncomplete": np.sum,
-                                                        "NumMissing": np.sum,
-                                                        "NumZero": np.sum,
-                                                   }).stack()
+    assignments_df = assignments_df.astype({"Score": float})
+    return assignments_df.groupby(list(by) + ["SubjectName", "CategoryName"], observed=True).agg({
+            "CategoryWeight": 'first',
+            "Score": 'mean',
+            "NumAssignments": 'size',
+            "NumBlank": 'sum',
+            "NumExcused": 'sum',
+            "NumIncomplete": 'sum',
+            "NumMissing": 'sum',
+            "NumZero": 'sum',
+        }).sort_index()
+
+def get_unused_category_rows(category_aggregates, unused_cats_df):
+    """Rows like get_category_aggregates' for unused categories, which have no assignments.
+
+    Unused categories named like a category in category_aggregates are
+    left out: they're used after all. Anti-joins once instead of checking
+    each unused category.
+
+    Returns:
+    df indexed by (SubjectName, CategoryName), with the columns of category_aggregates
+    """
+    key_cols = ["SubjectName", "CategoryName"]
+    unused_rows = (unused_cats_df[key_cols + ["CategoryWeight"]]
+                        .drop_duplicates(key_cols)
+                        .set_index(key_cols))
+    unused_rows = unused_rows[~unused_rows.index.isin(category_aggregates.index)]
+    count_cols = [col for col in category_aggregates.columns if col.startswith("Num")]
+    return unused_rows.assign(Score=np.nan, **{col: 0 for col in count_cols})[category_aggregates.columns]
+
+def to_flagged_html(df, is_flagged, formatters=None):
+    """df, bool Series -> html table of df, with the flagged rows in FLAGGED_ROW_CLASS.
+
+    Stands in for pandas' Styler, which imports matplotlib, so that
+    svg charts are drawn without it.
+    """
+    html = df.to_html(formatters=formatters)
+    head, body = html.split("<tbody>", 1)
+    # to_html starts every body row with a bare <tr>, in the order of df's rows
+    rows = body.split("<tr>")
+    return head + "<tbody>" + rows[0] + "".join(
+            ('<tr class="{}">'.format(FLAGGED_ROW_CLASS) if flagged else "<tr>") + row
+                for flagged, row in zip(is_flagged, rows[1:]))
+
+def format_category_table(assignments_pivot, unused_cats_df):
+    """df of category aggregates of one report, df -> html"""
     # append unused categories to the end; because categories are unused (ie have no assignments),
     # they don't show up in the assignments_df
-    for _, row in unused_cats_df.iterrows():
-        new_assignments_row = pd.DataFrame({
-                    "SubjectName": row["SubjectName"],
-                    "CategoryName": row["CategoryName"],
-                    "CategoryWeight": row["CategoryWeight"],
-                    "Score": np.nan,
-                    "NumAssignments": 0,
-                    "NumBlank": 0,
-                    "NumExcused": 0,
-                    "NumIncomplete": 0,
-                    "NumMissing": 0,
-                    "NumZero": 0
-                }, index=["temp_value"])
-        new_assignments_row.set_index(["SubjectName", "CategoryName"], inplace=True)
-        # Only append new_assignments_row to dataframe if a category with the same
-        # name isn't already there.
-        # (sometimes, an unused category with the same name as a used category shows up
-        #    in that case, obviously it's not in fact an unused category and it should be ignored)
-        if not (row["SubjectName"], row["CategoryName"]) in assignments_pivot.index:
-            assignments_pivot = assignments_pivot.append(new_assignments_row)
+    assignments_pivot = pd.concat([assignments_pivot, get_unused_category_rows(assignments_pivot, unused_cats_df)])
 
     assignments_pivot = assignments_pivot.round(decimals=1)
     assignments_pivot = assignments_pivot.fillna("n/a")
@@ -189,56 +312,88 @@ def render_category_table(assignments_df, unused_cats_df):
             "NumMissing",
             "NumZero"
         ]]
+    # color categories red if there are no assignments
+    return to_flagged_html(assignments_pivot, assignments_pivot["NumAssignments"] == 0)
+
+@instrumentation.timed("render_category_table")
+def render_category_table(assignments_df, unused_cats_df):
+    return format_category_table(get_category_aggregates(assignments_df), unused_cats_df)
+
+def get_report_category_weights(teacher_fullname, homeroom):
+    """-> rows of data_checks.get_category_weight_totals of one report, indexed by (SubjectName, ClassName)"""
+    totals = data_checks.get_category_weight_totals()
     try:
-        assignments_pivot.style.set_properties(**{'font-size':'6pt'})
-    except ValueError as e:
-        print(assignments_pivot)
-    # color NumAssignments red if there are no assignments
-    def highlight_rows_with_no_assignments(row):
-        return ["background-color: #ff6347;" if (row["NumAssignments"] == 0) else "" for elem in row]
-    
-    return assignments_pivot.style.apply(highlight_rows_with_no_assignments, axis=1).render()
-
-
-CACHED_MOST_RECENT_ASSIGNMENT_DATE = None
-def get_most_recent_assignment_entered_date():
-    global CACHED_MOST_RECENT_ASSIGNMENT_DATE
-    if CACHED_MOST_RECENT_ASSIGNMENT_DATE is not None:
-        return CACHED_MOST_RECENT_ASSIGNMENT_DATE
-
-    assignments_df = get_assignments_df()
-    if (assignments_df["GradeEnteredOn"].dtype != 'datetime64'):
-        dates = pd.to_datetime(assignments_df["GradeEnteredOn"])
-    else:
-        dates = assignments_df["GradeEnteredOn"]
-    most_recent_date = dates.max()
-    CACHED_MOST_RECENT_ASSIGNMENT_DATE = most_recent_date
-    return most_recent_date
+        return totals.xs((teacher_fullname, homeroom), level=[0, 1])
+    except KeyError:
+        return totals.iloc[0:0].droplevel([0, 1])
+
+def format_category_weight_flags(category_weights):
+    """df of category weight totals of one report -> html"""
+    category_weights = category_weights.reset_index().set_index("SubjectName")
+    category_weights = category_weights[["TotalWeight", "NumCategories", "WeightsAddUp"]]
+    # color subjects red if their weights don't add up to 100
+    return to_flagged_html(category_weights, ~category_weights["WeightsAddUp"],
+                           formatters={"TotalWeight": "{:.1f}".format})
+
+@instrumentation.timed("render_category_weight_flags")
+def render_category_weight_flags(teacher_fullname, homeroom):
+    return format_category_weight_flags(get_report_category_weights(teacher_fullname, homeroom))
+
+def get_report_score_anomalies(teacher_fullname, homeroom):
+    """-> rows of data_checks.get_score_anomaly_summary of one report,
+    indexed by (SubjectName, ASGName, AssignmentDue, Anomaly)"""
+    summary = data_checks.get_score_anomaly_summary()
+    try:
+        return summary.xs((teacher_fullname, homeroom), level=[0, 1])
+    except KeyError:
+        return summary.iloc[0:0].droplevel([0, 1])
+
+def format_score_anomalies(score_anomalies):
+    """df of score anomalies of one report -> html"""
+    if score_anomalies.empty:
+        return "<p>No scores above ScorePossible, negative or unreadable.</p>"
+    return score_anomalies.to_html()
+
+@instrumentation.timed("render_score_anomalies")
+def render_score_anomalies(teacher_fullname, homeroom):
+    return format_score_anomalies(get_report_score_anomalies(teacher_fullname, homeroom))
+
+
+def get_most_recent_assignment_entered_date(assignments_df, by=()):
+    """Returns the latest GradeEnteredOn of assignments_df, eg of one report's assignments.
+
+    With by, a list of columns (eg REPORT_KEY_COLS), returns a dict of the
+    latest date per value of those columns instead.
+    """
+    # parsed when the extract is loaded
+    dates = assignments_df["GradeEnteredOn"]
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates)
+    if not by:
+        return dates.max()
+    return dates.groupby([assignments_df[col] for col in by], observed=True).max().to_dict()
 
 def render_template(template_vars):
     report_name = template_vars["report_name"]
+    render_context = report_rendering.get_render_context()
 
     # render html
-    TEMPLATE_DIR = "templates"
-    TEMPLATE_FILE = "gb_report_template.html"
-    env = jinja2.Environment(loader=jinja2.FileSystemLoader(TEMPLATE_DIR))
-    template = env.get_template(TEMPLATE_FILE)
-
-    html_report = template.render(template_vars)
+    with instrumentation.stage("render_template html"):
+        html_report = render_context.render_html(template_vars)
 
-    # DEBUG: save html for inspection
-    with open("test.html", "w") as test_file:
-        test_file.write(html_report)
+    if report_rendering.DEBUG_HTML_DIR is not None:
+        # save html for inspection
+        render_context.save_debug_html([template_vars], report_name, report_rendering.DEBUG_HTML_DIR)
 
     # render pdf
-    OUTPUT_DIR = "./reports"
     # save report as PDF to output dir
-    STYLESHEET_FILE = "./templates/typography.css"
-    output_path = path.join(OUTPUT_DIR, "{}.pdf".format(report_name))
-    weasyprint.HTML(string=html_report, base_url="./").write_pdf(output_path, stylesheets=[STYLESHEET_FILE])
+    output_path = get_report_filepath(report_name)
+    with instrumentation.stage("render_template pdf"):
+        render_context.render_pdf(html_report, output_path)
 
+@instrumentation.timed("render_missing_zero_assignments")
 def render_missing_zero_assignments(assignments_df):
-    assignments_gdf_by_subject = assignments_df.groupby("SubjectName")
+    assignments_gdf_by_subject = assignments_df.groupby("SubjectName", observed=True)
     missing_zero_assignments = assignments_gdf_by_subject.apply(lambda group: pd.Series({
                 "# Missing / Zero assignments": group["NumMissing"].sum() + group["NumZero"].sum()
             })
@@ -247,28 +402,42 @@ def render_missing_zero_assignments(assignments_df):
     missing_zero_assignments = missing_zero_assignments[missing_zero_assignments["# Missing / Zero assignments"] != 0]
     return missing_zero_assignments.to_html()
 
-# returns success: boolean
-def create_gradebook_summary(teacher_fullname, homeroom):
+def get_report_name(teacher_fullname, homeroom):
+    return "Gradebook Report - {} - {}".format(teacher_fullname, homeroom)
 
-    # get data in df form
-    grade_df = get_grade_df()
-    unused_cats_df = get_unused_cats_df()
-    assignments_df = get_assignments_df()
+def get_report_filepath(report_name):
+    return path.join(OUTPUT_DIR, "{}.pdf".format(report_name))
 
-    # filter dfs by teacher
-    grade_df = grade_df[grade_df["TeacherFullname"] == teacher_fullname]
-    unused_cats_df = unused_cats_df[unused_cats_df["TeacherFullname"] == teacher_fullname]
-    assignments_df = assignments_df[assignments_df["TeacherFullname"] == teacher_fullname]
+# returns (grade_df, assignments_df, unused_cats_df) | None
+def get_report_inputs(teacher_fullname, homeroom):
+    """Returns the rows a report is built from, or None if there is no report."""
+    # get data in df form, already partitioned by teacher and homeroom
+    partitions = get_report_partitions()
 
-    # filter dfs by homeroom
-    grade_df = grade_df[grade_df["Homeroom"] == homeroom]
-    unused_cats_df = unused_cats_df[unused_cats_df["Homeroom"] == homeroom]
-    assignments_df = assignments_df[assignments_df["Homeroom"] == homeroom]
+    # if there are no grades or assignments for this report, skip
+    if (teacher_fullname, homeroom) not in partitions:
+        return None
+    return partitions.get(teacher_fullname, homeroom)
+
+# returns str | None
+def get_report_fingerprint(teacher_fullname, homeroom):
+    """Fingerprint of everything a report is rendered from, for incremental runs."""
+    report_inputs = get_report_inputs(teacher_fullname, homeroom)
+    if report_inputs is None:
+        return None
+    report_frames = list(report_inputs) + [get_report_category_weights(teacher_fullname, homeroom),
+                                           get_report_score_anomalies(teacher_fullname, homeroom)]
+    # the report's most recent grade date is one of its assignment rows
+    return report_manifest.fingerprint_frames(report_frames, extra=[DIAGRAM_FORMAT, CHART_BACKEND])
+
+# returns dict | None
+def get_report_template_vars(teacher_fullname, homeroom):
+    """Renders every section of a report, or returns None if there is no report."""
+    report_inputs = get_report_inputs(teacher_fullname, homeroom)
+    if report_inputs is None:
+        return None
+    grade_df, assignments_df, unused_cats_df = report_inputs
 
-    # if dfs are empty, skip
-    if grade_df.empty or assignments_df.empty:
-        return False
-    
     template_vars = {}
 
     template_vars["grade_breakdown_diagrams"] = render_grade_breakdown_diagrams(grade_df)
@@ -277,9 +446,110 @@ def create_gradebook_summary(teacher_fullname, homeroom):
     template_vars["negative_impact_assignments"] = render_negative_impact_assignments(assignments_df)
     #template_vars["missing_zero_assignments"] = render_missing_zero_assignments(assignments_df)
     template_vars["category_table"] = render_category_table(assignments_df, unused_cats_df)
-    template_vars["most_recent_grade_date"] = get_most_recent_assignment_entered_date()
+    template_vars["category_weight_flags"] = render_category_weight_flags(teacher_fullname, homeroom)
+    template_vars["score_anomalies"] = render_score_anomalies(teacher_fullname, homeroom)
+    template_vars["most_recent_grade_date"] = get_most_recent_assignment_entered_date(assignments_df)
+
+    template_vars["report_name"] = get_report_name(teacher_fullname, homeroom)
+    return template_vars
+
+# returns ({(str, str): dict}, {(str, str): str})
+def get_all_report_template_vars(keys):
+    """Renders every section of many reports, in one grouped operation per section.
+
+    Computes the letter grade counts, failing students, negative impact
+    assignments and category aggregates of every report in keys at once,
+    then splits them by report for formatting. Gives the same sections as
+    get_report_template_vars on each report, with pandas' per-call overhead
+    paid once per section instead of once per report.
+
+    One bad row fails a grouped operation for every report, so if any
+    fails, each report's sections are rendered with get_report_template_vars
+    instead, and only the reports with bad rows fail.
 
-    template_vars["report_name"] = "Gradebook Report - {} - {}".format(teacher_fullname, homeroom)
+    Returns:
+    ({(teacher_fullname, homeroom): template_vars} for the keys with a
+    report, {(teacher_fullname, homeroom): traceback} of the reports that
+    failed)
+    """
+    partitions = get_report_partitions()
+    keys = [key for key in keys if key in partitions]
+    grade_df, assignments_df, _ = partitions.get_many(keys)
+
+    batch_sections = [
+        ("grade_counts", "batch grade counts", lambda: split_by_report(
+                get_grade_counts_by_subject(grade_df, by=REPORT_KEY_COLS), keys, level=True)),
+        ("failing_students", "batch failing students", lambda: split_by_report(
+                get_failing_students(grade_df), keys)),
+        ("negative_impact_assignments", "batch negative impact assignments", lambda: split_by_report(
+                get_negative_impact_assignments(assignments_df, by=REPORT_KEY_COLS), keys)),
+        ("category_aggregates", "batch category aggregates", lambda: split_by_report(
+                get_category_aggregates(assignments_df, by=REPORT_KEY_COLS), keys, level=True)),
+        ("category_weights", "batch category weights", lambda: split_by_report(
+                data_checks.get_category_weight_totals(), keys, level=True)),
+        ("score_anomalies", "batch score anomalies", lambda: split_by_report(
+                data_checks.get_score_anomaly_summary(), keys, level=True)),
+        ("most_recent_grade_date", "batch most recent grade date", lambda: get_most_recent_assignment_entered_date(
+                assignments_df, by=REPORT_KEY_COLS)),
+    ]
+    sections = {}
+    for name, stage, get_section in batch_sections:
+        with instrumentation.stage(stage):
+            try:
+                sections[name] = get_section()
+            except Exception:
+                traceback.print_exc()
+                print("Batch {} failed, rendering each report's sections separately".format(name))
+                break
+
+    all_template_vars = {}
+    errors = {}
+    with instrumentation.stage("batch format sections"):
+        for key in keys:
+            teacher_fullname, homeroom = key
+            try:
+                if len(sections) < len(batch_sections):
+                    all_template_vars[key] = get_report_template_vars(teacher_fullname, homeroom)
+                else:
+                    all_template_vars[key] = format_report_template_vars(key, sections, partitions)
+            except Exception:
+                errors[key] = traceback.format_exc()
+    return all_template_vars, errors
+
+def format_report_template_vars(key, sections, partitions):
+    """-> template vars of one report, from the sections of get_all_report_template_vars"""
+    teacher_fullname, homeroom = key
+    _, _, unused_cats_df = partitions.get(teacher_fullname, homeroom)
+    return {
+        "grade_breakdown_diagrams": draw_grade_breakdown_diagrams(sections["grade_counts"][key],
+                                                                  teacher_fullname, homeroom),
+        "failing_students": format_failing_students_table(sections["failing_students"][key]),
+        "negative_impact_assignments": format_negative_impact_assignments(
+                                            sections["negative_impact_assignments"][key]),
+        "category_table": format_category_table(sections["category_aggregates"][key], unused_cats_df),
+        "category_weight_flags": format_category_weight_flags(sections["category_weights"][key]),
+        "score_anomalies": format_score_anomalies(sections["score_anomalies"][key]),
+        "most_recent_grade_date": sections["most_recent_grade_date"][key],
+        "report_name": get_report_name(teacher_fullname, homeroom),
+    }
+
+# returns success: boolean
+def create_gradebook_summary(teacher_fullname, homeroom):
+
+    template_vars = get_report_template_vars(teacher_fullname, homeroom)
+    if template_vars is None:
+        return False
 
     render_template(template_vars)
     return True
+
+def render_merged_template(template_vars_list, output_path, title="Gradebook Reports"):
+    """Renders several reports into one PDF, each starting on a new page."""
+    render_context = report_rendering.get_render_context()
+    with instrumentation.stage("render_merged_template html"):
+        html_report = render_context.render_many_html(template_vars_list, title)
+    if report_rendering.DEBUG_HTML_DIR is not None:
+        render_context.save_debug_html(template_vars_list, title, report_rendering.DEBUG_HTML_DIR)
+    # one layout pass for every report
+    with instrumentation.stage("render_merged_template pdf"):
+        render_context.render_pdf(html_report, output_path)
@@ -0,0 +1,173 @@
+import unittest
+import re
+import tempfile
+import os.path as path
+import numpy as np
+import pandas as pd
+import data_access
+import extract_cache
+import create_gradebook_summary as gb_summary
+from gbutils import calculate_negative_impact
+from synthetic_extracts import generate_extracts
+
+def normalize_html(html):
+    # pandas styles tables with random ids
+    return re.sub(r"T_[0-9a-f]+", "T_", html)
+
+class GetAllReportTemplateVars(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        generate_extracts(path.join(self.tmp_dir.name, "synthetic"),
+                          num_schools=2,
+                          teachers_per_school=3,
+                          students_per_homeroom=8,
+                          assignments_per_class=6)
+        self.saved_settings = (data_access.SOURCE_DIR, data_access.DATE, extract_cache.ENABLED)
+        data_access.SOURCE_DIR = self.tmp_dir.name
+        data_access.DATE = "synthetic"
+        extract_cache.ENABLED = False
+        data_access.clear_caches()
+
+    def tearDown(self):
+        data_access.SOURCE_DIR, data_access.DATE, extract_cache.ENABLED = self.saved_settings
+        data_access.clear_caches()
+        self.tmp_dir.cleanup()
+
+    def test__should_match_per_report_template_vars(self):
+        keys = data_access.get_report_partitions().keys()
+        all_template_vars, errors = gb_summary.get_all_report_template_vars(keys)
+
+        self.assertEqual(errors, {})
+        self.assertEqual(sorted(all_template_vars), keys)
+        for teacher_fullname, homeroom in keys:
+            expected_vars = gb_summary.get_report_template_vars(teacher_fullname, homeroom)
+            actual_vars = all_template_vars[(teacher_fullname, homeroom)]
+            self.assertEqual(sorted(actual_vars), sorted(expected_vars))
+            for name, expected_value in expected_vars.items():
+                if isinstance(expected_value, str):
+                    self.assertEqual(normalize_html(actual_vars[name]), normalize_html(expected_value), name)
+                else:
+                    self.assertEqual(actual_vars[name], expected_value, name)
+
+    def test__should_skip_keys_without_report(self):
+        keys = data_access.get_report_partitions().keys()
+        all_template_vars, _ = gb_summary.get_all_report_template_vars(keys[:2] + [("Nobody", "Z999")])
+        self.assertEqual(sorted(all_template_vars), keys[:2])
+
+    def test__should_only_change_fingerprint_of_report_with_new_grade(self):
+        keys = data_access.get_report_partitions().keys()
+        fingerprints = {key: gb_summary.get_report_fingerprint(*key) for key in keys}
+
+        # a grade entered after every other one
+        dataset = data_access.get_dataset()
+        assignments_df = dataset.get_assignments_df()
+        assignments_df.iloc[0, assignments_df.columns.get_loc("GradeEnteredOn")] = pd.Timestamp("2100-01-01")
+        changed_key = tuple(assignments_df[["TeacherFullname", "Homeroom"]].iloc[0])
+        dataset.invalidate("report_partitions")
+
+        changed = [key for key in keys if gb_summary.get_report_fingerprint(*key) != fingerprints[key]]
+        self.assertEqual(changed, [changed_key])
+
+    def test__should_only_fail_reports_with_bad_rows(self):
+        # a bad quarter average fails the grouped grade counts of every report
+        grade_df = data_access.get_dataset().get_grade_df()
+        grade_df["QuarterAvgCode"] = grade_df["QuarterAvgCode"].cat.add_categories(["??"])
+        grade_df.iloc[0, grade_df.columns.get_loc("QuarterAvgCode")] = "??"
+        bad_key = tuple(grade_df[["TeacherFullname", "Homeroom"]].iloc[0])
+
+        keys = data_access.get_report_partitions().keys()
+        all_template_vars, errors = gb_summary.get_all_report_template_vars(keys)
+        self.assertEqual(list(errors), [bad_key])
+        self.assertIn("Bad QuarterAvg", errors[bad_key])
+        self.assertEqual(sorted(all_template_vars), [key for key in keys if key != bad_key])
+
+def get_negative_impact_assignments_rowwise(assignments_df):
+    """The per-row negative impact table get_negative_impact_assignments replaced"""
+    assignments_df = assignments_df[assignments_df["Score"].notnull()]
+    output_dfs = []
+    for _, df in assignments_df.groupby("SubjectName"):
+        df = df.copy()
+        df["Total # Assignments in Category"] = df.apply(lambda row: len(assignments_df[
+                                                (assignments_df["CategoryName"] == row["CategoryName"]) &
+                                                (assignments_df["ClassName"] == row["ClassName"])
+                                            ].index), axis=1)
+        df["Negative Impact"] = df.apply(lambda row: calculate_negative_impact(
+                                                        row["Score"],
+                                                        row["ScorePossible"],
+                                                        row["CategoryWeight"],
+                                                        row["Total # Assignments in Category"],
+                                                    ), axis=1)
+        df = df.sort_values(["Negative Impact"], ascending=False, kind="mergesort")
+        output_dfs.append(df.head(gb_summary.NUM_NEGATIVE_IMPACT_ASSIGNMENTS))
+    return pd.concat(output_dfs, ignore_index=True)
+
+class GetNegativeImpactAssignments(unittest.TestCase):
+
+    # Homework (40%, 2 assignments) and Classwork (20%, 1 assignment) of
+    # WRITING tie at 50%, and the two NaN averages (every grade ignored)
+    # are dropped
+    assignments_df = pd.DataFrame({
+            "SubjectName": ["MATHEMATICS STD"] * 8 + ["WRITING STANDARDS"] * 4,
+            "ClassName": ["MATHEMATICS STD (A101)"] * 8 + ["WRITING STANDARDS (A101)"] * 4,
+            "CategoryName": ["Homework", "Homework", "Homework", "Assessments", "Assessments",
+                             "Classwork", "Classwork", "Homework",
+                             "Homework", "Homework", "Classwork", "Classwork"],
+            "CategoryWeight": [30.0, 30.0, 30.0, 50.0, 50.0, 20.0, 20.0, 30.0,
+                               40.0, 40.0, 20.0, 20.0],
+            "ASGName": ["HW {}".format(i) for i in range(12)],
+            "Score": [70.0, 85.0, np.nan, 60.0, 92.5, 100.0, 40.0, 70.0,
+                      50.0, 80.0, 50.0, np.nan],
+            "ScorePossible": [100.0] * 12,
+        })
+
+    def test__should_match_rowwise_implementation(self):
+        columns = ["SubjectName", "ASGName", "Total # Assignments in Category", "Negative Impact"]
+        expected = get_negative_impact_assignments_rowwise(self.assignments_df)[columns]
+        actual = gb_summary.get_negative_impact_assignments(self.assignments_df).reset_index(drop=True)[columns]
+        pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+    def test__should_keep_top_assignments_of_each_subject(self):
+        actual = gb_summary.get_negative_impact_assignments(self.assignments_df)
+        self.assertEqual(list(actual["SubjectName"].value_counts().sort_index()),
+                         [gb_summary.NUM_NEGATIVE_IMPACT_ASSIGNMENTS, 3])
+        # ties keep source order
+        self.assertEqual(list(actual["ASGName"].iloc[-3:]), ["HW 8", "HW 10", "HW 9"])
+
+class ToFlaggedHtml(unittest.TestCase):
+
+    def test__should_flag_rows_like_to_html(self):
+        df = pd.DataFrame({"NumAssignments": [2, 0, 1]},
+                          index=pd.MultiIndex.from_tuples([("MATHEMATICS STD", "Homework"),
+                                                           ("MATHEMATICS STD", "Projects"),
+                                                           ("WRITING STANDARDS", "Homework")]))
+        html = gb_summary.to_flagged_html(df, df["NumAssignments"] == 0)
+        self.assertEqual(html.replace(' class="flagged"', ""), df.to_html())
+        flagged_row = html.split('<tr class="flagged">')[1].split("</tr>")[0]
+        self.assertIn("Projects", flagged_row)
+        self.assertEqual(html.count('class="flagged"'), 1)
+
+class GetUnusedCategoryRows(unittest.TestCase):
+
+    def test__should_skip_categories_with_assignments(self):
+        category_aggregates = pd.DataFrame({
+                "SubjectName": ["MATHEMATICS STD"],
+                "CategoryName": ["Homework"],
+                "CategoryWeight": [20.0],
+                "Score": [85.0],
+                "NumAssignments": [4],
+                "NumMissing": [1],
+            }).set_index(["SubjectName", "CategoryName"])
+        unused_cats_df = pd.DataFrame({
+                "SubjectName": ["MATHEMATICS STD", "MATHEMATICS STD", "MATHEMATICS STD"],
+                "CategoryName": ["Homework", "Participation", "Participation"],
+                "CategoryWeight": [20.0, 10.0, 10.0],
+            })
+        unused_rows = gb_summary.get_unused_category_rows(category_aggregates, unused_cats_df)
+        self.assertEqual(list(unused_rows.index), [("MATHEMATICS STD", "Participation")])
+        self.assertEqual(list(unused_rows.columns), list(category_aggregates.columns))
+        self.assertTrue(np.isnan(unused_rows["Score"].iloc[0]))
+        self.assertEqual(unused_rows[["NumAssignments", "NumMissing"]].values.tolist(), [[0, 0]])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,25 +1,115 @@
 import pandas as pd
 import numpy as np
-from gradeconvert import to_percentage_grade, to_letter_grade
-import gbutils
+from gradeconvert import to_percentage_grade, to_letter_grade, split_scores
+from enums import Cols
+import aggregate
+import extract_cache
+import instrumentation
+import os
 import os.path as path
 import re
-
-DATE = "2018-05-14"
-
-CACHED_GRADE_DF = None
-CACHED_ASSIGNMENTS_DF = None
-CACHED_CATEGORIES_DF = None
-CACHED_UNUSED_CATEGORIES_DF = None
+import threading
+
+SOURCE_DIR = os.environ.get("GB_SOURCE_DIR", "./source")
+# folder of SOURCE_DIR with the extracts to report on, named after the day
+# they were pulled, eg "2018-05-14". None for the most recent one.
+DATE = os.environ.get("GB_EXTRACT_DATE") or None
+
+# file names of the gradebook extracts in SOURCE_DIR/DATE
+GRADE_DATA_FILENAME = "ESCumulativeGradesExtract.csv"
+ASSIGNMENT_DATA_FILENAME = "CPSAllAssignmentsandGradesExtract(SlowLoad).csv"
+CATEGORY_DATA_FILENAME = "CPSTeacherCategoriesandTotalPointsLogic.csv"
+UNUSED_CATS_FILENAME = "CPSUnusedCategoriesinTeacherGradebooks.csv"
+
+# rows of the student assignments extract read at a time
+ASSIGNMENT_CHUNK_SIZE = 100000
+# columns read from the student assignments extract. Scores mix numbers with
+# letter grades and grade codes, so they stay strings.
+ASSIGNMENT_EXTRACT_DTYPES = {col.value: str for col in Cols
+                                if col is not Cols.TeacherFullname}
+ASSIGNMENT_EXTRACT_DTYPES[Cols.CategoryWeight.value] = float
+
+# Schemas of the other extracts: text columns are read as str and numbers as
+# float, instead of letting read_csv guess per file. Columns not listed are
+# still read, with guessed types.
+GRADE_EXTRACT_DTYPES = {
+    "SchoolID": str,
+    "StudentID": str,
+    "StudentFirstName": str,
+    "StudentLastName": str,
+    "StudentHomeroom": str,
+    "SubjectName": str,
+    "TeacherFirstName": str,
+    "TeacherLastName": str,
+    # numbers, letter grades or blank; split into QuarterAvg and QuarterAvgCode
+    "QuarterAvg": str,
+}
+CATEGORY_EXTRACT_DTYPES = {
+    "SchoolID": str,
+    "TeacherFirstName": str,
+    "TeacherLastName": str,
+    "ClassName": str,
+    "CategoryName": str,
+    "CategoryWeight": float,
+}
+UNUSED_CATS_EXTRACT_DTYPES = {
+    "Teacher First": str,
+    "Teacher Last": str,
+    "Class Name": str,
+    "Unused Category": str,
+    "Category Weight": float,
+    "Total Class Assignments": float,
+}
+
+# Columns of the loaded frames stored as categoricals: teachers, classes,
+# subjects, homerooms and categories repeat across many rows.
+GRADE_CATEGORY_COLS = ["SchoolID", "StudentHomeroom", "SubjectName", "TeacherFirstName",
+                       "TeacherLastName", "TeacherFullname", "ClassName", "Homeroom", "QuarterAvgCode"]
+ASSIGNMENT_CATEGORY_COLS = [Cols.ClassName.value, Cols.TeacherLastname.value, Cols.TeacherFirstname.value,
+                            Cols.TeacherFullname.value, Cols.AssignmentName.value, Cols.CategoryName.value,
+                            Cols.SchoolId.value, Cols.GradeLevel.value, "SubjectName", "Homeroom"]
+CATEGORY_CATEGORY_COLS = ["SchoolID", "TeacherFirstName", "TeacherLastName", "TeacherFullname",
+                          "ClassName", "CategoryName", "SubjectName", "Homeroom"]
+UNUSED_CATS_CATEGORY_COLS = ["ClassName", "CategoryName", "TeacherFullname", "SubjectName", "Homeroom"]
+# date columns of the assignments frame, parsed once the extract is aggregated
+ASSIGNMENT_DATE_COLS = [Cols.AssignmentDue.value, Cols.AssignedDate.value, Cols.GradeEnteredOn.value]
+
+def get_latest_extract_date(source_dir):
+    """-> name of the last folder of source_dir, in sort order, with a grade extract"""
+    dates = sorted(name for name in os.listdir(source_dir)
+                        if path.isfile(path.join(source_dir, name, GRADE_DATA_FILENAME)))
+    if not dates:
+        raise FileNotFoundError("No extracts in {}".format(source_dir))
+    return dates[-1]
+
+def get_extract_dir():
+    return path.join(SOURCE_DIR, DATE or get_latest_extract_date(SOURCE_DIR))
+
+def get_extract_filepath(filename):
+    return path.join(get_extract_dir(), filename)
+
+def use_extract_dir(extract_dir):
+    """Points SOURCE_DIR and DATE at extract_dir. Datasets already loaded are kept."""
+    global SOURCE_DIR, DATE
+    SOURCE_DIR, DATE = path.split(path.normpath(extract_dir))
+
+MAIN_SUBJECT_PATTERN = re.compile("CHGO READING FRMWK|MATHEMATICS STD|SCIENCE  STANDARDS|SOCIAL SCIENCE STD|WRITING STANDARDS")
+# "SUBJECT (HOMEROOM)": the subject is everything up to the first "(", the
+# homeroom everything up to the last ")" after it
+CLASS_NAME_PATTERN = re.compile(r"^([^(]*)\((.*)\)")
 
 def is_main_subject(subject_name):
     # return true if the subject is Reading, Math, Sci, Soc Sci, or Writing
-    matchObj = re.search("CHGO READING FRMWK|MATHEMATICS STD|SCIENCE  STANDARDS|SOCIAL SCIENCE STD|WRITING STANDARDS", subject_name)
+    matchObj = MAIN_SUBJECT_PATTERN.search(subject_name)
     if matchObj:
         return True
     else:
         return False
 
+def are_main_subjects(subject_names):
+    """Series of subject names -> bool Series, is_main_subject of each"""
+    return subject_names.str.contains(MAIN_SUBJECT_PATTERN, na=False)
+
 def get_subject_from_class_name(class_name):
     # HACK: for some bizarre reason on of the entries encloses the homeroom
     # with a ']' insted of a ')'
@@ -41,110 +131,229 @@ def get_hr_from_class_name(class_name):
         raise ValueError("No homeroom parsed from {}".format(homeroom))
     return homeroom
 
+def parse_class_names(class_names):
+    """Parses subject and homeroom out of "SUBJECT (HOMEROOM)" class names.
+
+    Same results as get_subject_from_class_name and get_hr_from_class_name,
+    but each distinct class name is parsed once, with Series.str methods,
+    and the results are mapped back to the rows.
+
+    Positional args:
+    class_names: Series of str
+
+    Returns:
+    df with SubjectName and Homeroom columns, indexed like class_names
+
+    Raises:
+    ValueError listing every class name without a subject or homeroom, and
+    the rows it's in.
+    """
+    class_names = class_names.fillna("")
+    codes, distinct_names = pd.factorize(class_names)
+    distinct_names = pd.Series(distinct_names, dtype=object)
+    # HACK: for some bizarre reason on of the entries encloses the homeroom
+    # with a ']' insted of a ')'
+    normalized = (distinct_names.astype(str)
+                    .str.replace("[", "(", regex=False)
+                    .str.replace("]", ")", regex=False))
+    parts = normalized.str.extract(CLASS_NAME_PATTERN)
+    subjects = parts[0].str.strip()
+    homerooms = parts[1].str.strip()
+
+    bad_names = []
+    for i in np.flatnonzero(subjects.isnull().values):
+        # names without "(...)": parse them exactly like the scalar functions
+        try:
+            subjects.iat[i] = get_subject_from_class_name(distinct_names.iat[i])
+            homerooms.iat[i] = get_hr_from_class_name(distinct_names.iat[i])
+        except (ValueError, AttributeError):
+            bad_names.append(i)
+    bad_names.extend(np.flatnonzero(((subjects == "") | (homerooms == "")).values))
+    if bad_names:
+        raise ValueError("No subject or homeroom parsed from class names: {}".format(
+            ", ".join("{!r} (rows {})".format(distinct_names.iat[i], list(class_names.index[codes == i]))
+                        for i in sorted(set(bad_names)))))
+
+    return pd.DataFrame({
+        "SubjectName": subjects.values[codes],
+        "Homeroom": homerooms.values[codes],
+    }, index=class_names.index)
+
+def fill_str_cols(df, dtypes):
+    """Fills NaN's with empty strings in the str columns of a schema."""
+    str_cols = [col for col, dtype in dtypes.items() if dtype is str and col in df]
+    df[str_cols] = df[str_cols].fillna("")
+
+def apply_schema(df, category_cols=(), date_cols=()):
+    """Returns df with category_cols as categoricals and date_cols parsed as dates.
+
+    Unparseable dates become NaT.
+    """
+    df = df.astype({col: "category" for col in category_cols if col in df})
+    for col in date_cols:
+        if col in df:
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+    return df
+
+def get_fullnames(first_names, last_names):
+    """Series, Series -> "First Last" Series"""
+    return first_names.astype(str) + " " + last_names.astype(str)
+
 def get_grade_df():
+    return get_dataset().get_grade_df()
 
-    global CACHED_GRADE_DF
-    if CACHED_GRADE_DF is not None:
-        return CACHED_GRADE_DF
+def load_grade_df(dataset):
+    filepath = dataset.get_filepath(GRADE_DATA_FILENAME)
+    with instrumentation.stage("load grade_df"):
+        return extract_cache.load_or_build("grade_df", [filepath], lambda: read_grade_df(filepath))
 
-    GRADE_DATA_FILEPATH = "./source/{}/ESCumulativeGradesExtract.csv".format(DATE)
-    df = pd.read_csv(GRADE_DATA_FILEPATH)
+def read_grade_df(filepath):
+    df = pd.read_csv(filepath, dtype=GRADE_EXTRACT_DTYPES)
     # fill NaN's with empty string
-    df.fillna("", inplace=True)
+    fill_str_cols(df, GRADE_EXTRACT_DTYPES)
+
+    # split quarter averages into numbers and letter grades / blanks
+    df["QuarterAvg"], df["QuarterAvgCode"] = split_scores(df["QuarterAvg"])
 
     # add column with teacher full name
-    df["TeacherFullname"] = df.apply(lambda row:
-       "{} {}".format(row.loc["TeacherFirstName"], row.loc["TeacherLastName"]), axis=1)
-    
+    df["TeacherFullname"] = get_fullnames(df["TeacherFirstName"], df["TeacherLastName"])
+
     # add column with ClassName (SubjectName + StudentHomeroom)
-    df["ClassName"] = df.apply(lambda row:
-            "{} ({})".format(row.loc["SubjectName"], row.loc["StudentHomeroom"]), axis=1)
+    df["ClassName"] = df["SubjectName"].astype(str) + " (" + df["StudentHomeroom"].astype(str) + ")"
 
     # add Homeroom column for consistency with other data sources
     df["Homeroom"] = df["StudentHomeroom"]
 
     # CHAVEZ SPECIFIC LOGIC - may not apply to other schools #
     # filter all grades, keeping only grades where SubjectName is what we want
-    df = df[df["SubjectName"].apply(is_main_subject)]
+    df = df[are_main_subjects(df["SubjectName"].astype(str))]
     # END CHAVEZ SPECIFIC LOGIC #
 
-    CACHED_GRADE_DF = df
-    return df
+    return apply_schema(df, GRADE_CATEGORY_COLS)
 
 def get_assignments_df():
-
-    global CACHED_ASSIGNMENTS_DF
-    if CACHED_ASSIGNMENTS_DF is not None:
-        return CACHED_ASSIGNMENTS_DF
-
-    ASSIGNMENT_DATA_FILEPATH = "./source/{}/CPSAllAssignmentsandGradesExtract(SlowLoad).csv".format(DATE)
-    df = pd.read_csv(ASSIGNMENT_DATA_FILEPATH)
-
-    # fill NaN's with empty string
-    df.fillna("", inplace=True)
-    # add column with teacher full name
-    df["TeacherFullname"] = df.apply(lambda row:
-        "{} {}".format(row.loc["TeacherFirst"], row.loc["TeacherLast"]), axis=1)
-    
-    # aggregate data on assignment level, folding individual student
-    # assignments into averaged student assignments
-    df = gbutils.aggregate_assignments(df)
-
-    # add column with subject name
-    df["SubjectName"] = df.apply(lambda row:
-            get_subject_from_class_name(row["ClassName"]), axis=1)
-
-    # add column with homeroom
-    df["Homeroom"] = df.apply(lambda row:
-            get_hr_from_class_name(row["ClassName"]), axis=1)
-
+    return get_dataset().get_assignments_df()
+
+def load_assignments_df(dataset):
+    return dataset.get("assignment_frames", load_assignment_frames)["assignments_df"]
+
+def load_assignment_frames(dataset):
+    """Reads the student assignments extract once for both frames built from it.
+
+    Returns:
+    {"assignments_df": df, "score_anomalies_df": df} -- the aggregated
+    assignments, and the data_checks.check_scores anomalies of the raw rows
+    """
+    # data_checks imports this module
+    import data_checks
+    filepath = dataset.get_filepath(ASSIGNMENT_DATA_FILENAME)
+    built_frames = {}
+    def build(name):
+        if not built_frames:
+            assignments_df, anomaly_dfs = read_assignments_df(filepath, check_chunk=data_checks.scan_scores)
+            built_frames["assignments_df"] = assignments_df
+            built_frames["score_anomalies_df"] = data_checks.prepare_score_anomalies(anomaly_dfs)
+        return built_frames[name]
+
+    with instrumentation.stage("load assignments_df"):
+        # each frame is cached on its own, and the extract is only read if one isn't
+        return {name: extract_cache.load_or_build(name, [filepath], lambda: build(name))
+                    for name in ("assignments_df", "score_anomalies_df")}
+
+def read_assignments_df(filepath, check_chunk=None):
+    """Reads the student assignments extract and aggregates it per assignment.
+
+    Keyword args:
+    check_chunk: (df) -> df -- (optional) run on each chunk of raw student
+        assignments, before it's filtered and aggregated, eg
+        data_checks.scan_scores. Checking in the same pass saves reading
+        the extract, the largest one, a second time.
+
+    Returns:
+    (assignments_df, check_chunk results of each chunk)
+    """
+    # The extract has one row per student per assignment, so it is read in
+    # chunks and each chunk is folded into per-assignment running totals.
+    # Peak memory is bounded by the number of assignments, not the number of
+    # student assignments.
+    reader = pd.read_csv(filepath,
+                         usecols=list(ASSIGNMENT_EXTRACT_DTYPES),
+                         dtype=ASSIGNMENT_EXTRACT_DTYPES,
+                         chunksize=ASSIGNMENT_CHUNK_SIZE)
+    partial_df = pd.DataFrame()
+    checked_dfs = []
+    for chunk in reader:
+        # fill NaN's with empty string
+        fill_str_cols(chunk, ASSIGNMENT_EXTRACT_DTYPES)
+        if check_chunk is not None:
+            checked_dfs.append(check_chunk(chunk))
+        chunk = prepare_assignments_chunk(chunk)
+        if chunk.empty:
+            continue
+        with instrumentation.stage("aggregate_assignments"):
+            partial_df = aggregate.combine_partial_aggregates([
+                partial_df,
+                aggregate.partial_aggregate_assignments(chunk),
+            ])
+    df = aggregate.finalize_aggregate(partial_df)
+    if df.empty:
+        return df, checked_dfs
+
+    # add columns with subject name and homeroom
+    df[["SubjectName", "Homeroom"]] = parse_class_names(df["ClassName"])
+
+    return apply_schema(df, ASSIGNMENT_CATEGORY_COLS, ASSIGNMENT_DATE_COLS), checked_dfs
+
+def prepare_assignments_chunk(chunk):
+    """Adds TeacherFullname and drops non-main subjects from a chunk of student assignments."""
     # CHAVEZ SPECIFIC LOGIC - may not apply to other schools #
-    # filter all grades, keeping only grades where SubjectName is what we want
-    df = df[df["SubjectName"].apply(is_main_subject)]
+    # filter all grades, keeping only grades where SubjectName is what we want.
+    # Done before aggregating.
+    subject_names = parse_class_names(chunk[Cols.ClassName.value])["SubjectName"]
+    chunk = chunk[are_main_subjects(subject_names)].copy()
     # END CHAVEZ SPECIFIC LOGIC #
 
-    CACHED_ASSIGNMENTS_DF = df
-    return df
+    # add column with teacher full name
+    chunk[Cols.TeacherFullname.value] = get_fullnames(chunk[Cols.TeacherFirstname.value],
+                                                      chunk[Cols.TeacherLastname.value])
+    return chunk
 
 def get_categories_df():
+    return get_dataset().get_categories_df()
 
-    global CACHED_CATEGORIES_DF
-    if CACHED_CATEGORIES_DF is not None:
-        return CACHED_CATEGORIES_DF
+def load_categories_df(dataset):
+    filepath = dataset.get_filepath(CATEGORY_DATA_FILENAME)
+    with instrumentation.stage("load categories_df"):
+        return extract_cache.load_or_build("categories_df", [filepath], lambda: read_categories_df(filepath))
 
-    CATEGORY_DATA_FILEPATH = "./source/{}/CPSTeacherCategoriesandTotalPointsLogic.csv".format(DATE)
-    df = pd.read_csv(CATEGORY_DATA_FILEPATH)
+def read_categories_df(filepath):
+    df = pd.read_csv(filepath, dtype=CATEGORY_EXTRACT_DTYPES)
     # fill NaN's with empty string
-    df.fillna("", inplace=True)
+    fill_str_cols(df, CATEGORY_EXTRACT_DTYPES)
 
     # add column with teacher full name
-    df["TeacherFullname"] = df.apply(lambda row:
-            "{} {}".format(row.loc["TeacherFirstName"], row.loc["TeacherLastName"]), axis=1)
+    df["TeacherFullname"] = get_fullnames(df["TeacherFirstName"], df["TeacherLastName"])
 
-    # add column with subject name
-    df["SubjectName"] = df.apply(lambda row:
-            get_subject_from_class_name(row["ClassName"]), axis=1)
-
-    # add column with homeroom
-    df["Homeroom"] = df.apply(lambda row:
-            get_hr_from_class_name(row["ClassName"]), axis=1)
+    # add columns with subject name and homeroom
+    df[["SubjectName", "Homeroom"]] = parse_class_names(df["ClassName"])
 
     # CHAVEZ SPECIFIC LOGIC - may not apply to other schools #
     # filter all grades, keeping only grades where SubjectName is what we want
-    df = df[df["SubjectName"].apply(is_main_subject)]
+    df = df[are_main_subjects(df["SubjectName"])]
     # END CHAVEZ SPECIFIC LOGIC #
 
-    CACHED_CATEGORIES_DF = df
-    return df
+    return apply_schema(df, CATEGORY_CATEGORY_COLS)
 
 def get_unused_cats_df():
+    return get_dataset().get_unused_cats_df()
 
-    global CACHED_UNUSED_CATEGORIES_DF
-    if CACHED_UNUSED_CATEGORIES_DF is not None:
-        return CACHED_UNUSED_CATEGORIES_DF
+def load_unused_cats_df(dataset):
+    filepath = dataset.get_filepath(UNUSED_CATS_FILENAME)
+    with instrumentation.stage("load unused_cats_df"):
+        return extract_cache.load_or_build("unused_cats_df", [filepath], lambda: read_unused_cats_df(filepath))
 
-    UNUSED_CATS_FILEPATH = "./source/{}/CPSUnusedCategoriesinTeacherGradebooks.csv".format(DATE)
-    source_df = pd.read_csv(UNUSED_CATS_FILEPATH)
+def read_unused_cats_df(filepath):
+    source_df = pd.read_csv(filepath, dtype=UNUSED_CATS_EXTRACT_DTYPES)
     # keep only the columns we care about
     df = pd.DataFrame()
     # rename "Column Name" -> "ColumnName" for consistency w/ other data sources
@@ -154,22 +363,205 @@ def get_unused_cats_df():
     df["TotalClassAssignments"] = source_df["Total Class Assignments"]
 
     # add column with teacher full name
-    df["TeacherFullname"] = source_df.apply(lambda row:
-            "{} {}".format(row.loc["Teacher First"], row.loc["Teacher Last"]), axis=1)
-
-    # add column with subject by parsing it from class
-    df["SubjectName"] = source_df.apply(lambda row:
-            get_subject_from_class_name(row["Class Name"]), axis=1)
-
-    # add column with homeroom
-    df["Homeroom"] = df.apply(lambda row:
-            get_hr_from_class_name(row["ClassName"]), axis=1)
+    df["TeacherFullname"] = get_fullnames(source_df["Teacher First"], source_df["Teacher Last"])
 
+    # add columns with subject and homeroom by parsing them from class
+    df[["SubjectName", "Homeroom"]] = parse_class_names(df["ClassName"])
 
     # CHAVEZ SPECIFIC LOGIC - may not apply to other schools #
     # filter all grades, keeping only grades where SubjectName is what we want
-    df = df[df["SubjectName"].apply(is_main_subject)]
+    df = df[are_main_subjects(df["SubjectName"])]
     # END CHAVEZ SPECIFIC LOGIC #
 
-    CACHED_UNUSED_CATEGORIES_DF = df
-    return df
+    return apply_schema(df, UNUSED_CATS_CATEGORY_COLS)
+
+class ReportPartitions:
+    """Row positions of each (TeacherFullname, Homeroom) in the source frames.
+
+    Built once after loading, so that each report takes its rows with an
+    iloc lookup instead of filtering every frame with boolean masks.
+    """
+    PARTITION_COLS = ["TeacherFullname", "Homeroom"]
+
+    def __init__(self, grade_df, assignments_df, unused_cats_df):
+        self.grade_df = grade_df
+        self.assignments_df = assignments_df
+        self.unused_cats_df = unused_cats_df
+        self.grade_rows = self._get_partition_rows(grade_df)
+        self.assignments_rows = self._get_partition_rows(assignments_df)
+        self.unused_cats_rows = self._get_partition_rows(unused_cats_df)
+
+    @classmethod
+    def _get_partition_rows(cls, df):
+        if df.empty:
+            return {}
+        return df.groupby(cls.PARTITION_COLS, observed=True).indices
+
+    @staticmethod
+    def _take(df, partition_rows, key):
+        return df.iloc[partition_rows.get(key, [])]
+
+    def keys(self):
+        """-> sorted list of (teacher_fullname, homeroom) with grades and assignments"""
+        return sorted(set(self.grade_rows) & set(self.assignments_rows))
+
+    @staticmethod
+    def _take_many(df, partition_rows, keys):
+        positions = [partition_rows[key] for key in keys if key in partition_rows]
+        if not positions:
+            return df.iloc[0:0]
+        # keep the rows in source order
+        return df.iloc[np.sort(np.concatenate(positions))]
+
+    def __contains__(self, key):
+        return key in self.grade_rows and key in self.assignments_rows
+
+    def get(self, teacher_fullname, homeroom):
+        """-> (grade_df, assignments_df, unused_cats_df) for one report"""
+        key = (teacher_fullname, homeroom)
+        return (self._take(self.grade_df, self.grade_rows, key),
+                self._take(self.assignments_df, self.assignments_rows, key),
+                self._take(self.unused_cats_df, self.unused_cats_rows, key))
+
+    def get_many(self, keys):
+        """-> (grade_df, assignments_df, unused_cats_df) with the rows of every report in keys"""
+        return (self._take_many(self.grade_df, self.grade_rows, keys),
+                self._take_many(self.assignments_df, self.assignments_rows, keys),
+                self._take_many(self.unused_cats_df, self.unused_cats_rows, keys))
+
+def get_report_partitions():
+    return get_dataset().get_report_partitions()
+
+def load_report_partitions(dataset):
+    grade_df = dataset.get_grade_df()
+    assignments_df = dataset.get_assignments_df()
+    unused_cats_df = dataset.get_unused_cats_df()
+    with instrumentation.stage("partition reports"):
+        return ReportPartitions(grade_df, assignments_df, unused_cats_df)
+
+class GradebookDataset:
+    """The frames of the extracts in one folder, each loaded on first use.
+
+    Besides the frames, any value computed from them can be kept with get,
+    eg the date of the most recent grade. Each value is loaded once: loads
+    hold a lock, so threads asking for a value at the same time wait for
+    one load instead of each reading the extract. invalidate forgets values
+    so they're loaded again, with the values loaded from them.
+
+    Datasets of different folders are independent, so several extracts
+    (eg two weeks) can be held at once. get_dataset keeps one per folder.
+    """
+
+    def __init__(self, extract_dir):
+        self.extract_dir = extract_dir
+        self._values = {}
+        # {name: names of the values whose load got it}
+        self._dependents = {}
+        self._lock = threading.RLock()
+        self._loading = threading.local()
+
+    def __getstate__(self):
+        # sent to worker processes without the lock and thread state, which can't be pickled
+        state = self.__dict__.copy()
+        del state["_lock"]
+        del state["_loading"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+        self._loading = threading.local()
+
+    def get_filepath(self, filename):
+        return path.join(self.extract_dir, filename)
+
+    def _get_loading_names(self):
+        """-> names of the values this thread is loading, innermost last"""
+        if not hasattr(self._loading, "names"):
+            self._loading.names = []
+        return self._loading.names
+
+    def get(self, name, load):
+        """Returns the value called name, built with load(dataset) on first use.
+
+        The values load gets from the dataset are remembered as its
+        dependencies, for invalidate.
+        """
+        loading_names = self._get_loading_names()
+        if loading_names:
+            with self._lock:
+                self._dependents.setdefault(name, set()).add(loading_names[-1])
+        try:
+            return self._values[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._values:
+                loading_names.append(name)
+                try:
+                    self._values[name] = load(self)
+                finally:
+                    loading_names.pop()
+            return self._values[name]
+
+    def is_loaded(self, name):
+        return name in self._values
+
+    def invalidate(self, *names):
+        """Forgets the values called names, and every value loaded from them,
+        or every value without names."""
+        with self._lock:
+            if not names:
+                self._values.clear()
+                self._dependents.clear()
+            names = list(names)
+            while names:
+                name = names.pop()
+                self._values.pop(name, None)
+                names.extend(self._dependents.pop(name, ()))
+
+    def get_grade_df(self):
+        return self.get("grade_df", load_grade_df)
+
+    def get_assignments_df(self):
+        return self.get("assignments_df", load_assignments_df)
+
+    def get_categories_df(self):
+        return self.get("categories_df", load_categories_df)
+
+    def get_unused_cats_df(self):
+        return self.get("unused_cats_df", load_unused_cats_df)
+
+    def get_report_partitions(self):
+        return self.get("report_partitions", load_report_partitions)
+
+# {extract dir: GradebookDataset}
+DATASETS = {}
+DATASETS_LOCK = threading.Lock()
+
+def get_dataset(extract_dir=None):
+    """-> the GradebookDataset of extract_dir (default: get_extract_dir()), shared by every caller"""
+    extract_dir = path.normpath(extract_dir or get_extract_dir())
+    with DATASETS_LOCK:
+        dataset = DATASETS.get(extract_dir)
+        if dataset is None:
+            dataset = DATASETS[extract_dir] = GradebookDataset(extract_dir)
+    return dataset
+
+def clear_caches():
+    """Forgets every dataset, eg after an extract changed on disk."""
+    with DATASETS_LOCK:
+        DATASETS.clear()
+
+def get_cache_snapshot():
+    """-> the current dataset with the frames reports are built from loaded, for handing to worker processes"""
+    dataset = get_dataset()
+    dataset.get_categories_df()
+    dataset.get_report_partitions()
+    return dataset
+
+def restore_cache_snapshot(dataset):
+    """Makes a dataset from get_cache_snapshot() the current one, so nothing is re-read."""
+    use_extract_dir(dataset.extract_dir)
+    with DATASETS_LOCK:
+        DATASETS[dataset.extract_dir] = dataset
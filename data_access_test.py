@@ -0,0 +1,139 @@
+import unittest
+import os
+import os.path as path
+import tempfile
+import pickle
+import threading
+import time
+import pandas as pd
+from data_access import (
+        parse_class_names,
+        get_subject_from_class_name,
+        get_hr_from_class_name,
+        are_main_subjects,
+        is_main_subject,
+        get_fullnames,
+        get_latest_extract_date,
+        get_dataset,
+        clear_caches,
+        GradebookDataset,
+        GRADE_DATA_FILENAME
+)
+
+class ParseClassNames(unittest.TestCase):
+
+    def test__should_match_scalar_parsers(self):
+        class_names = pd.Series([
+            "MATHEMATICS STD (A101)",
+            "SCIENCE  STANDARDS (B202]",
+            "WRITING STANDARDS [A103]",
+            "MATHEMATICS STD (A101)",
+            "  SOCIAL SCIENCE STD  ( B104 ) ",
+            "ART (A (1)) extra",
+            "PHYSICAL EDUCATION",
+        ], index=[10, 11, 12, 13, 14, 15, 16])
+        parsed = parse_class_names(class_names)
+
+        self.assertListEqual(list(parsed.index), list(class_names.index))
+        self.assertListEqual(list(parsed["SubjectName"]),
+                             [get_subject_from_class_name(c) for c in class_names])
+        self.assertListEqual(list(parsed["Homeroom"]),
+                             [get_hr_from_class_name(c) for c in class_names])
+
+    def test__should_report_every_bad_class_name_at_once(self):
+        class_names = pd.Series(["MATHEMATICS STD (A101)", "(A102)", "MATHEMATICS STD ()", "(A102)", None])
+        with self.assertRaises(ValueError) as context:
+            parse_class_names(class_names)
+        message = str(context.exception)
+        self.assertIn("'(A102)' (rows [1, 3])", message)
+        self.assertIn("'MATHEMATICS STD ()' (rows [2])", message)
+        self.assertIn("'' (rows [4])", message)
+        self.assertNotIn("A101", message)
+
+class AreMainSubjects(unittest.TestCase):
+
+    def test__should_match_is_main_subject(self):
+        subject_names = pd.Series(["CHGO READING FRMWK", "MATHEMATICS STD", "PHYSICAL EDUCATION", "", "ADV MATHEMATICS STD"])
+        self.assertListEqual(list(are_main_subjects(subject_names)),
+                             [is_main_subject(s) for s in subject_names])
+
+class GetFullnames(unittest.TestCase):
+
+    def test__should_join_first_and_last_names(self):
+        fullnames = get_fullnames(pd.Series(["Ana", "Luz"]), pd.Series(["Cabrera", "Escobar"]))
+        self.assertListEqual(list(fullnames), ["Ana Cabrera", "Luz Escobar"])
+
+class GetLatestExtractDate(unittest.TestCase):
+
+    def test__should_skip_folders_without_extracts(self):
+        with tempfile.TemporaryDirectory() as source_dir:
+            for date in ("2018-04-30", "2018-05-14", "2018-06-01"):
+                os.makedirs(path.join(source_dir, date))
+            for date in ("2018-04-30", "2018-05-14"):
+                open(path.join(source_dir, date, GRADE_DATA_FILENAME), "w").close()
+            self.assertEqual(get_latest_extract_date(source_dir), "2018-05-14")
+
+    def test__should_throw_without_extracts(self):
+        with tempfile.TemporaryDirectory() as source_dir:
+            self.assertRaises(FileNotFoundError, lambda: get_latest_extract_date(source_dir))
+
+class GradebookDatasetTest(unittest.TestCase):
+
+    def setUp(self):
+        self.num_loads = 0
+
+    def slow_load(self, dataset):
+        self.num_loads += 1
+        time.sleep(0.05)
+        return dataset.extract_dir
+
+    def test__should_load_once_for_concurrent_callers(self):
+        dataset = GradebookDataset("./source/2018-05-14")
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(dataset.get("value", self.slow_load)))
+                        for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.num_loads, 1)
+        self.assertEqual(results, ["./source/2018-05-14"] * 8)
+
+    def test__should_reload_after_invalidate(self):
+        dataset = GradebookDataset("./source/2018-05-14")
+        dataset.get("value", self.slow_load)
+        dataset.invalidate("value")
+        self.assertFalse(dataset.is_loaded("value"))
+        dataset.get("value", self.slow_load)
+        self.assertEqual(self.num_loads, 2)
+
+    def test__should_invalidate_values_loaded_from_invalidated_ones(self):
+        dataset = GradebookDataset("./source/2018-05-14")
+        load_total = lambda dataset: dataset.get("value", self.slow_load) + "/total"
+        dataset.get("other", self.slow_load)
+        self.assertEqual(dataset.get("total", load_total), "./source/2018-05-14/total")
+        dataset.invalidate("value")
+        self.assertFalse(dataset.is_loaded("total"))
+        self.assertTrue(dataset.is_loaded("other"))
+        dataset.get("total", load_total)
+        self.assertEqual(self.num_loads, 3)
+
+    def test__should_keep_values_when_pickled(self):
+        dataset = GradebookDataset("./source/2018-05-14")
+        dataset.get("value", self.slow_load)
+        restored = pickle.loads(pickle.dumps(dataset))
+        self.assertEqual(restored.get("value", self.slow_load), "./source/2018-05-14")
+        self.assertEqual(self.num_loads, 1)
+
+    def test__should_keep_one_dataset_per_extract_dir(self):
+        clear_caches()
+        try:
+            this_week = get_dataset("./source/2018-05-14")
+            last_week = get_dataset("./source/2018-05-07")
+            self.assertIs(get_dataset("./source/2018-05-14/"), this_week)
+            self.assertIsNot(this_week, last_week)
+        finally:
+            clear_caches()
+
+if __name__ == "__main__":
+    unittest.main()
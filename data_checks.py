@@ -0,0 +1,179 @@
+"""Data quality checks over the whole extract.
+
+Each check runs once, as a grouped or vectorized pass over the frame of the
+whole school, instead of once per report. Its result is split per report
+for the report's flag table and written as a school-wide exceptions CSV.
+
+Category weights: the weights of the categories of a class should add up
+to 100.
+
+Scores: check_scores scans the raw student assignments extract, as each
+chunk is read and before it's aggregated, for scores above ScorePossible (which
+percentages silently cap at 100), negative scores, numeric scores out of a
+zero or blank ScorePossible, and scores that are neither numbers nor known
+codes. It flags every bad row of a chunk at once, instead of stopping at
+the first one. Aggregating ignores the invalid scores, so the reports
+still render and list them.
+"""
+import os
+import os.path as path
+import numpy as np
+import pandas as pd
+import data_access
+import instrumentation
+from data_access import ReportPartitions
+from enums import Cols, GradeCodes, ScoreAnomaly
+from gradeconvert import split_scores, LETTER_GRADES
+
+CATEGORY_WEIGHT_TOTAL = 100
+# weights are entered with up to two decimals
+CATEGORY_WEIGHT_TOLERANCE = 0.01
+# a row per class of each report
+CATEGORY_WEIGHT_KEY_COLS = ReportPartitions.PARTITION_COLS + ["SubjectName", "ClassName"]
+CATEGORY_WEIGHT_EXCEPTIONS_FILENAME = "category_weight_exceptions.csv"
+
+# columns of the student assignments extract kept by the score scan
+SCORE_SCAN_DTYPES = {col.value: str for col in (
+    Cols.SchoolId,
+    Cols.TeacherFirstname,
+    Cols.TeacherLastname,
+    Cols.ClassName,
+    Cols.AssignmentName,
+    Cols.AssignmentDue,
+    Cols.StudentId,
+    Cols.StudentFirstname,
+    Cols.StudentLastname,
+    Cols.Score,
+    Cols.ScorePossible,
+)}
+# non-numeric scores decode_scores understands
+KNOWN_SCORE_CODES = ([code.value for code in GradeCodes] + [""] +
+                     list(LETTER_GRADES) + [letter.lower() for letter in LETTER_GRADES])
+# a row per (subject, assignment, anomaly) of each report
+SCORE_ANOMALY_KEY_COLS = ReportPartitions.PARTITION_COLS + [
+    "SubjectName",
+    Cols.AssignmentName.value,
+    Cols.AssignmentDue.value,
+    "Anomaly",
+]
+SCORE_ANOMALIES_FILENAME = "score_anomalies.csv"
+
+def check_category_weights(categories_df):
+    """Adds up the category weights of every class.
+
+    Returns:
+    df indexed by (TeacherFullname, Homeroom, SubjectName, ClassName) with
+    columns TotalWeight, NumCategories and WeightsAddUp
+    """
+    totals = categories_df.groupby(CATEGORY_WEIGHT_KEY_COLS, observed=True).agg({
+            "CategoryWeight": "sum",
+            "CategoryName": "size",
+        }).sort_index()
+    totals.columns = ["TotalWeight", "NumCategories"]
+    totals["WeightsAddUp"] = (totals["TotalWeight"] - CATEGORY_WEIGHT_TOTAL).abs() <= CATEGORY_WEIGHT_TOLERANCE
+    return totals
+
+def check_scores(student_assignments_df):
+    """Finds the student assignments with a bad Score or ScorePossible.
+
+    Positional args:
+    student_assignments_df: df of raw student assignments, with at least
+        the Score and ScorePossible columns, as strings.
+
+    Returns:
+    the bad rows of student_assignments_df, with an Anomaly column of
+    ScoreAnomaly values. A row with several anomalies gets the first of
+    UnparseableScore, NegativeScore, NoScorePossible and ScoreAboveMax.
+    """
+    scores = student_assignments_df[Cols.Score.value]
+    is_code = scores.isin(KNOWN_SCORE_CODES).values
+    score_values, _ = split_scores(scores, known_codes=KNOWN_SCORE_CODES)
+    possible_values, _ = split_scores(student_assignments_df[Cols.ScorePossible.value], known_codes=[""])
+    is_number = ~np.isnan(score_values)
+    has_possible = ~np.isnan(possible_values) & (possible_values != 0)
+    with np.errstate(invalid="ignore"):
+        anomalies = np.select([
+                ~is_number & ~is_code,
+                is_number & (score_values < 0),
+                is_number & ~has_possible,
+                is_number & has_possible & (score_values > possible_values),
+            ], [
+                ScoreAnomaly.UnparseableScore.value,
+                ScoreAnomaly.NegativeScore.value,
+                ScoreAnomaly.NoScorePossible.value,
+                ScoreAnomaly.ScoreAboveMax.value,
+            ], default=None)
+    is_anomaly = pd.notnull(anomalies)
+    return student_assignments_df[is_anomaly].assign(Anomaly=anomalies[is_anomaly])
+
+def scan_scores(chunk):
+    """check_scores of a chunk of the student assignments extract, with the
+    columns of SCORE_SCAN_DTYPES"""
+    return check_scores(chunk[list(SCORE_SCAN_DTYPES)])
+
+def prepare_score_anomalies(anomaly_dfs):
+    """Joins the scan_scores of each chunk of the student assignments extract.
+
+    Returns:
+    df of the bad student assignments, with TeacherFullname, SubjectName
+    and Homeroom
+    """
+    df = pd.concat(anomaly_dfs, ignore_index=True) if anomaly_dfs else pd.DataFrame(columns=list(SCORE_SCAN_DTYPES) + ["Anomaly"])
+
+    # only the bad rows are parsed further
+    df[Cols.TeacherFullname.value] = data_access.get_fullnames(df[Cols.TeacherFirstname.value],
+                                                               df[Cols.TeacherLastname.value])
+    df[["SubjectName", "Homeroom"]] = data_access.parse_class_names(df[Cols.ClassName.value])
+    return data_access.apply_schema(df, ["Anomaly"])
+
+def summarize_score_anomalies(anomalies_df):
+    """-> number of students per (TeacherFullname, Homeroom, SubjectName,
+    ASGName, AssignmentDue, Anomaly), for the reports"""
+    summary = anomalies_df.groupby(SCORE_ANOMALY_KEY_COLS, observed=True).agg({
+            Cols.StudentId.value: "size",
+        }).sort_index()
+    summary.columns = ["NumStudents"]
+    return summary
+
+def load_category_weight_totals(dataset):
+    categories_df = dataset.get_categories_df()
+    with instrumentation.stage("check category weights"):
+        return check_category_weights(categories_df)
+
+def get_category_weight_totals():
+    """-> check_category_weights of the current dataset's categories, computed once"""
+    return data_access.get_dataset().get("category_weight_totals", load_category_weight_totals)
+
+def get_category_weight_exceptions():
+    """-> the rows of get_category_weight_totals whose weights don't add up to 100"""
+    totals = get_category_weight_totals()
+    return totals[~totals["WeightsAddUp"]]
+
+def write_category_weight_exceptions(output_dir):
+    """Writes the classes of the whole school whose weights don't add up to 100. Returns the CSV's path."""
+    os.makedirs(output_dir, exist_ok=True)
+    filepath = path.join(output_dir, CATEGORY_WEIGHT_EXCEPTIONS_FILENAME)
+    get_category_weight_exceptions().drop(columns="WeightsAddUp").to_csv(filepath)
+    return filepath
+
+def load_score_anomalies_df(dataset):
+    # scanned while the assignments are read
+    return dataset.get("assignment_frames", data_access.load_assignment_frames)["score_anomalies_df"]
+
+def get_score_anomalies_df():
+    """-> the bad student assignments of the current dataset's extract, scanned once"""
+    return data_access.get_dataset().get("score_anomalies_df", load_score_anomalies_df)
+
+def load_score_anomaly_summary(dataset):
+    return summarize_score_anomalies(dataset.get("score_anomalies_df", load_score_anomalies_df))
+
+def get_score_anomaly_summary():
+    """-> summarize_score_anomalies of get_score_anomalies_df(), computed once"""
+    return data_access.get_dataset().get("score_anomaly_summary", load_score_anomaly_summary)
+
+def write_score_anomalies(output_dir):
+    """Writes every bad student assignment of the district. Returns the CSV's path."""
+    os.makedirs(output_dir, exist_ok=True)
+    filepath = path.join(output_dir, SCORE_ANOMALIES_FILENAME)
+    get_score_anomalies_df().to_csv(filepath, index=False)
+    return filepath
@@ -0,0 +1,83 @@
+import unittest
+import tempfile
+import os.path as path
+import pandas as pd
+import data_access
+from enums import Cols, ScoreAnomaly
+from data_checks import check_category_weights, check_scores, scan_scores, prepare_score_anomalies
+from synthetic_extracts import generate_extracts
+
+class CheckCategoryWeights(unittest.TestCase):
+
+    categories_df = pd.DataFrame({
+            "TeacherFullname": ["Ana Cabrera"] * 5 + ["Luz Escobar"] * 2,
+            "Homeroom": ["A101"] * 5 + ["B212"] * 2,
+            "SubjectName": ["MATHEMATICS STD"] * 3 + ["WRITING STANDARDS"] * 2 + ["MATHEMATICS STD"] * 2,
+            "ClassName": ["MATHEMATICS STD (A101)"] * 3 + ["WRITING STANDARDS (A101)"] * 2
+                            + ["MATHEMATICS STD (B212)"] * 2,
+            "CategoryName": ["Homework", "Classwork", "Assessments", "Homework", "Assessments",
+                             "Homework", "Assessments"],
+            "CategoryWeight": [20.0, 30.0, 50.0, 40.0, 50.0, 33.33, 66.67],
+        })
+
+    def test__should_sum_weights_per_class(self):
+        totals = check_category_weights(self.categories_df)
+        self.assertEqual(list(totals["TotalWeight"]), [100.0, 90.0, 100.0])
+        self.assertEqual(list(totals["NumCategories"]), [3, 2, 2])
+
+    def test__should_flag_classes_not_adding_up_to_100(self):
+        totals = check_category_weights(self.categories_df)
+        flagged = totals[~totals["WeightsAddUp"]]
+        self.assertEqual(list(flagged.index),
+                         [("Ana Cabrera", "A101", "WRITING STANDARDS", "WRITING STANDARDS (A101)")])
+
+class CheckScores(unittest.TestCase):
+
+    student_assignments_df = pd.DataFrame({
+            Cols.Score.value: ["8", "12", "-1", "5", "5", "Msg", "A", "", "??", "10"],
+            Cols.ScorePossible.value: ["10", "10", "10", "0", "", "10", "", "", "10", "10"],
+        })
+
+    def test__should_flag_every_bad_row(self):
+        anomalies = check_scores(self.student_assignments_df)
+        self.assertEqual(list(anomalies.index), [1, 2, 3, 4, 8])
+        self.assertEqual(list(anomalies["Anomaly"]), [
+                ScoreAnomaly.ScoreAboveMax.value,
+                ScoreAnomaly.NegativeScore.value,
+                ScoreAnomaly.NoScorePossible.value,
+                ScoreAnomaly.NoScorePossible.value,
+                ScoreAnomaly.UnparseableScore.value,
+            ])
+
+    def test__should_keep_the_columns_of_the_rows(self):
+        anomalies = check_scores(self.student_assignments_df)
+        self.assertEqual(list(anomalies.columns),
+                         [Cols.Score.value, Cols.ScorePossible.value, "Anomaly"])
+        self.assertEqual(anomalies.loc[2, Cols.Score.value], "-1")
+
+class ScanScores(unittest.TestCase):
+
+    def test__should_scan_while_reading_assignments_without_failing(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            generate_extracts(tmp_dir, num_schools=1, teachers_per_school=3,
+                              students_per_homeroom=8, assignments_per_class=6)
+            filepath = path.join(tmp_dir, data_access.ASSIGNMENT_DATA_FILENAME)
+            student_assignments_df = pd.read_csv(filepath, dtype=str, keep_default_na=False)
+            student_assignments_df.loc[[2, 5, 7], Cols.Score.value] = ["1000", "??", "5"]
+            student_assignments_df.loc[7, Cols.ScorePossible.value] = "0"
+            student_assignments_df.to_csv(filepath, index=False)
+
+            # the invalid scores are ignored by the aggregates instead of failing them
+            assignments_df, checked_dfs = data_access.read_assignments_df(filepath, check_chunk=scan_scores)
+            anomalies_df = prepare_score_anomalies(checked_dfs)
+            self.assertFalse(assignments_df.empty)
+            expected_anomalies_df = prepare_score_anomalies([scan_scores(student_assignments_df)])
+            pd.testing.assert_frame_equal(anomalies_df, expected_anomalies_df)
+            self.assertEqual(list(anomalies_df["Anomaly"].iloc[:3]), [
+                    ScoreAnomaly.ScoreAboveMax.value,
+                    ScoreAnomaly.UnparseableScore.value,
+                    ScoreAnomaly.NoScorePossible.value,
+                ])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -33,3 +33,18 @@ class Cols(Enum):
     SchoolId="StuSchoolId"
     # added
     TeacherFullname="TeacherFullname"
+
+class ScoreStatus(Enum):
+    Numeric="numeric"
+    Letter="letter"
+    Missing="Missing"
+    Excused="Excused"
+    Incomplete="Incomplete"
+    Blank="blank"
+    Invalid="invalid"
+
+class ScoreAnomaly(Enum):
+    ScoreAboveMax="Score above ScorePossible"
+    NegativeScore="Negative score"
+    NoScorePossible="Zero or blank ScorePossible"
+    UnparseableScore="Unparseable score"
@@ -0,0 +1,188 @@
+"""On-disk cache of the preprocessed source extracts.
+
+Each frame built by data_access is stored in CACHE_DIR together with a
+fingerprint of the source files it was built from (path, size, mtime and md5
+of the contents) and of the code that built it. A frame is only read back if
+every fingerprint still matches, so changing an extract, or the
+preprocessing code, rebuilds it on the next run.
+
+Entries are keyed by the frame's name and the paths of its source files, so
+frames of different extract folders are cached side by side. Each build is
+written to a data file of its own, and the index naming it is swapped in
+afterwards, so a run never reads the data of another run through its index.
+
+Frames are stored as Parquet when pyarrow is installed, and pickled
+otherwise (or when a frame has columns Parquet can't store, like object
+columns mixing str and float).
+"""
+import os
+import os.path as path
+import json
+import pickle
+import uuid
+from hashlib import md5
+import pandas as pd
+
+CACHE_DIR = os.environ.get("GB_EXTRACT_CACHE_DIR", "./cache")
+ENABLED = os.environ.get("GB_EXTRACT_CACHE", "1") != "0"
+
+# modules whose code decides what the cached frames look like
+CODE_FILES = ("data_access.py", "aggregate.py", "gradeconvert.py", "enums.py", "data_checks.py")
+
+HASH_BLOCK_SIZE = 2 ** 20
+
+def hash_file(filepath):
+    """-> md5 hex digest of the file's contents"""
+    h = md5()
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def get_code_version():
+    """-> md5 of the preprocessing code"""
+    h = md5()
+    code_dir = path.dirname(path.abspath(__file__))
+    for filename in CODE_FILES:
+        with open(path.join(code_dir, filename), "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+def get_file_fingerprint(filepath, known_fingerprint=None):
+    """Returns {path, size, mtime, md5} of a source file.
+
+    Hashing a large extract is the slow part, so if the file's path, size
+    and mtime match known_fingerprint, its md5 is reused instead.
+    """
+    stat = os.stat(filepath)
+    fingerprint = {
+        "path": path.abspath(filepath),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+    }
+    if (known_fingerprint is not None and
+            all(known_fingerprint.get(k) == v for k, v in fingerprint.items())):
+        fingerprint["md5"] = known_fingerprint["md5"]
+    else:
+        fingerprint["md5"] = hash_file(filepath)
+    return fingerprint
+
+def is_same_content(fingerprints, known_fingerprints):
+    # mtime is left out: a touched but unchanged extract is still valid
+    def content_key(fp):
+        return (fp["path"], fp["size"], fp["md5"])
+    return [content_key(fp) for fp in fingerprints] == [content_key(fp) for fp in known_fingerprints]
+
+def get_entry_key(name, source_filepaths):
+    """-> key of the cache entry of the frame called name built from source_filepaths"""
+    h = md5()
+    for filepath in source_filepaths:
+        h.update(path.abspath(filepath).encode("utf-8"))
+        h.update(b"\0")
+    return "{}-{}".format(name, h.hexdigest()[:16])
+
+def get_index_path(key):
+    return path.join(CACHE_DIR, "{}.json".format(key))
+
+def read_index(key):
+    try:
+        with open(get_index_path(key)) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return None
+
+def write_index(key, index):
+    index_path = get_index_path(key)
+    tmp_path = "{}.{}.tmp".format(index_path, uuid.uuid4().hex)
+    with open(tmp_path, "w") as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp_path, index_path)
+
+def read_frame(index):
+    data_path = path.join(CACHE_DIR, index["data_file"])
+    if index["format"] == "parquet":
+        return pd.read_parquet(data_path)
+    with open(data_path, "rb") as f:
+        return pickle.load(f)
+
+def write_frame(key, df):
+    """Stores df in a new data file, never overwriting one an index points at.
+
+    Returns:
+    (data_file, format) of the stored frame
+    """
+    data_name = "{}-{}".format(key, uuid.uuid4().hex)
+    try:
+        data_file = "{}.parquet".format(data_name)
+        tmp_path = path.join(CACHE_DIR, data_file + ".tmp")
+        df.to_parquet(tmp_path)
+        file_format = "parquet"
+    except Exception:
+        # no pyarrow, or columns Parquet can't store
+        if path.exists(tmp_path):
+            os.remove(tmp_path)
+        data_file = "{}.pkl".format(data_name)
+        tmp_path = path.join(CACHE_DIR, data_file + ".tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+        file_format = "pickle"
+    os.replace(tmp_path, path.join(CACHE_DIR, data_file))
+    return data_file, file_format
+
+def remove_data_file(data_file):
+    # a concurrent run still reading it fails to, and rebuilds the frame
+    try:
+        os.remove(path.join(CACHE_DIR, data_file))
+    except OSError:
+        pass
+
+def load_or_build(name, source_filepaths, build):
+    """Returns the cached frame called name, or builds and caches it.
+
+    Positional args:
+    name: str -- frame name, eg "grade_df"
+    source_filepaths: str[] -- source files the frame is built from. With
+        name, they key the cache entry.
+    build: () -> df -- builds the frame from the source files
+
+    Returns:
+    df
+    """
+    if not ENABLED:
+        return build()
+
+    key = get_entry_key(name, source_filepaths)
+    index = read_index(key)
+    known_fingerprints = index["sources"] if index is not None else []
+    if len(known_fingerprints) != len(source_filepaths):
+        known_fingerprints = [None] * len(source_filepaths)
+    fingerprints = [get_file_fingerprint(filepath, known)
+                        for filepath, known in zip(source_filepaths, known_fingerprints)]
+    code_version = get_code_version()
+
+    if (index is not None and
+            index["code_version"] == code_version and
+            is_same_content(fingerprints, index["sources"])):
+        try:
+            df = read_frame(index)
+            if fingerprints != index["sources"]:
+                # remember new mtimes so the files aren't hashed next time
+                index["sources"] = fingerprints
+                write_index(key, index)
+            return df
+        except Exception as e:
+            print("Could not read cached {}, rebuilding: {}".format(name, e))
+
+    df = build()
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    data_file, file_format = write_frame(key, df)
+    write_index(key, {
+        "name": name,
+        "sources": fingerprints,
+        "code_version": code_version,
+        "data_file": data_file,
+        "format": file_format,
+    })
+    if index is not None and index.get("data_file") != data_file:
+        remove_data_file(index["data_file"])
+    return df
@@ -0,0 +1,53 @@
+import unittest
+import os
+import os.path as path
+import tempfile
+import pandas as pd
+import extract_cache
+
+class LoadOrBuild(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.saved_settings = (extract_cache.CACHE_DIR, extract_cache.ENABLED)
+        extract_cache.CACHE_DIR = path.join(self.tmp_dir.name, "cache")
+        extract_cache.ENABLED = True
+        self.num_builds = 0
+
+    def tearDown(self):
+        extract_cache.CACHE_DIR, extract_cache.ENABLED = self.saved_settings
+        self.tmp_dir.cleanup()
+
+    def write_extract(self, date, value):
+        extract_dir = path.join(self.tmp_dir.name, date)
+        os.makedirs(extract_dir, exist_ok=True)
+        filepath = path.join(extract_dir, "extract.csv")
+        pd.DataFrame({"Value": [value]}).to_csv(filepath, index=False)
+        return filepath
+
+    def build(self, filepath):
+        def build():
+            self.num_builds += 1
+            return pd.read_csv(filepath)
+        return build
+
+    def test__should_keep_frames_of_each_extract_dir(self):
+        this_week = self.write_extract("2018-05-14", 1)
+        last_week = self.write_extract("2018-05-07", 2)
+        for filepath in [this_week, last_week, this_week, last_week]:
+            df = extract_cache.load_or_build("grade_df", [filepath], self.build(filepath))
+            self.assertEqual(df["Value"].iloc[0], 1 if filepath == this_week else 2)
+        self.assertEqual(self.num_builds, 2)
+
+    def test__should_replace_data_file_on_rebuild(self):
+        filepath = self.write_extract("2018-05-14", 1)
+        extract_cache.load_or_build("grade_df", [filepath], self.build(filepath))
+        self.write_extract("2018-05-14", 3)
+        df = extract_cache.load_or_build("grade_df", [filepath], self.build(filepath))
+        self.assertEqual(df["Value"].iloc[0], 3)
+        self.assertEqual(self.num_builds, 2)
+        # one index and the one data file it points at
+        self.assertEqual(len(os.listdir(extract_cache.CACHE_DIR)), 2)
+
+if __name__ == "__main__":
+    unittest.main()
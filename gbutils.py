@@ -3,29 +3,42 @@ from hashlib import md5
 import pandas as pd
 import numpy as np
 from jinja2 import Environment, FileSystemLoader
-import matplotlib.pyplot as plt
 # from weasyprint import HTML
 
-from gradeconvert import to_letter_grade, to_percentage_grade
+from gradeconvert import to_percentage_grade, decode_scores, letter_grade_counts, LETTER_GRADES
 from enums import LetterGradeCutoffs, GradeCodes, Cols
 
 
-def get_lettergrade_breakdown(grade_df_subset):
-    def count_of_grades(letter_grade):
-        def matches_letter_grade(row):
-            score = row[Cols.Score.value]
-            score_possible = row[Cols.ScorePossible.value]
-            row_letter_grade = to_letter_grade(score, score_possible)
-            return row_letter_grade == letter_grade
-        return grade_df_subset[grade_df_subset.apply(matches_letter_grade, axis=1)].size
-    
-    return pd.Series((
-        count_of_grades("A"),
-        count_of_grades("B"),
-        count_of_grades("C"),
-        count_of_grades("D"),
-        count_of_grades("F"),
-    ), index=("A", "B", "C", "D", "F"))
+def get_lettergrade_histogram(percentages, subjects=None):
+    """Counts percentage grades per letter grade, in one pass.
+
+    Positional args:
+    percentages: float[] -- percentage grades, NaN for ignored grades.
+    subjects: str[]? -- (optional) subject of each grade.
+
+    Returns:
+    Series indexed by ("A", "B", "C", "D", "F"), or with subjects, a df
+    with one row per subject and one column per letter grade.
+    """
+    if subjects is None:
+        return pd.Series(letter_grade_counts(percentages), index=LETTER_GRADES)
+
+    subject_codes, subject_names = pd.factorize(pd.Series(subjects), sort=True)
+    counts = letter_grade_counts(percentages, subject_codes, len(subject_names))
+    return pd.DataFrame(counts, index=subject_names, columns=LETTER_GRADES)
+
+def get_lettergrade_breakdown(grade_df_subset, by=None):
+    """df -> Series of the number of A, B, C, D and F grades.
+
+    With by set to a column name (eg "SubjectName"), returns a df with one
+    row of counts per value of that column instead.
+    """
+    decoded = decode_scores(grade_df_subset[Cols.Score.value],
+                            grade_df_subset[Cols.ScorePossible.value])
+    if decoded.invalid_rows:
+        raise ValueError("Cannot parse scores in rows {}".format(decoded.invalid_rows))
+    subjects = grade_df_subset[by] if by is not None else None
+    return get_lettergrade_histogram(decoded.percentages, subjects)
 
 def calculate_negative_impact(score, possible_score, category_weight, num_assignments):
     if score is None:
@@ -41,6 +54,25 @@ def calculate_negative_impact(score, possible_score, category_weight, num_assign
     impact = (100 - percent_score) * (category_weight / 100) / float(num_assignments)
     return impact
 
+def calculate_negative_impacts(scores, possible_scores, category_weights, num_assignments):
+    """Vectorized calculate_negative_impact over Series of numeric scores.
+
+    Raises ValueError listing every bad row, rather than stopping at the first.
+    """
+    scores = scores.astype(float)
+    possible_scores = possible_scores.astype(float)
+    category_weights = category_weights.astype(float)
+
+    bad_rows = scores.index[(scores < 0) |
+                            (scores > possible_scores) |
+                            (category_weights < 0) |
+                            (category_weights > 100)]
+    if len(bad_rows) > 0:
+        raise ValueError("Bad scores or category weights in rows {}".format(list(bad_rows)))
+
+    percent_scores = (scores / possible_scores * 100).clip(lower=0, upper=100)
+    return (100 - percent_scores) * (category_weights / 100) / num_assignments.astype(float)
+
 def count_zeroes(df):
     s = df[Cols.Score.value]
     s = s[ (s == "0") | (s == 0) ]
@@ -56,6 +88,18 @@ def count_grade_code(df, grade_code):
     s = s[ (s == grade_code.value) ]
     return len(s) 
 
+def count_grade_codes(df):
+    """-> {count column: count} of the grade codes of df, from one value_counts of its scores"""
+    counts = df[Cols.Score.value].value_counts().to_dict()
+    return {
+        "NumMissing": counts.get(GradeCodes.Missing.value, 0),
+        "NumIncomplete": counts.get(GradeCodes.Incomplete.value, 0),
+        "NumExcused": counts.get(GradeCodes.Excused.value, 0),
+        # value_counts puts "0" and 0 apart
+        "NumZero": counts.get("0", 0) + counts.get(0, 0),
+        "NumBlank": counts.get("", 0),
+    }
+
 def aggregate_assignments(grade_df_subset):
     def average_assignments(df):
         assignment_grades = [to_percentage_grade(row[Cols.Score.value], row[Cols.ScorePossible.value])
@@ -83,12 +127,8 @@ def aggregate_assignments(grade_df_subset):
                 Cols.Score.value: group_average_percentage_or_nan,
                 Cols.ScorePossible.value: float(100),
                 "NumAssignments": len(group.index),
-                "NumMissing": count_grade_code(group, GradeCodes.Incomplete),
-                "NumIncomplete": count_grade_code(group, GradeCodes.Incomplete),
-                "NumExcused": count_grade_code(group ,GradeCodes.Excused),
-                "NumZero": count_zeroes(group),
-                "NumBlank": count_blanks(group)
             }
+        assignment_row.update(count_grade_codes(group))
 
         # add the rest of the columns to assignment_row by taking
         # the first element from group. We expect all of these
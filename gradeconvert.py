@@ -1,18 +1,244 @@
-import numpy as np
 import math
-from enums import LetterGradeCutoffs, GradeCodes
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+from enums import LetterGradeCutoffs, GradeCodes, ScoreStatus
 
-# str -> boolean
-def is_numeric(value):
+LETTER_GRADES = ("A", "B", "C", "D", "F")
+# bar colour of each letter grade, shared by the chart backends
+LETTER_GRADE_COLORS = {"A":"green",
+        "B": "yellowgreen",
+        "C": "yellow",
+        "D": "orange",
+        "F": "red"}
+
+# percentage given to a letter grade: the middle of the letter's range,
+# worked out once here
+def _midpoint(upper_cutoff, lower_cutoff):
+    return (upper_cutoff.value + lower_cutoff.value) / 2.0
+
+LETTER_GRADE_PERCENTAGES = {
+    "A": _midpoint(LetterGradeCutoffs.A, LetterGradeCutoffs.B),
+    "B": _midpoint(LetterGradeCutoffs.B, LetterGradeCutoffs.C),
+    "C": _midpoint(LetterGradeCutoffs.C, LetterGradeCutoffs.D),
+    "D": _midpoint(LetterGradeCutoffs.D, LetterGradeCutoffs.F),
+    "F": _midpoint(LetterGradeCutoffs.F, LetterGradeCutoffs.Zero),
+}
+
+# upper bounds (inclusive) of F, D, C and B. A percentage above the last
+# bound is an A.
+LETTER_GRADE_BINS = np.array((
+    LetterGradeCutoffs.F.value,
+    LetterGradeCutoffs.D.value,
+    LetterGradeCutoffs.C.value,
+    LetterGradeCutoffs.B.value,
+), dtype=float)
+# letter grade for each bin, in the order returned by np.searchsorted
+BINNED_LETTER_GRADES = np.array(("F", "D", "C", "B", "A"), dtype=object)
+
+# (scores, max_scores) -> (float[], str[], ScoreStatus.value[], row index[])
+DecodedScores = namedtuple("DecodedScores", [
+    "percentages",
+    "letters",
+    "statuses",
+    "invalid_rows",
+])
+
+# number of distinct (score, max_score) pairs to_percentage_grade and
+# to_letter_grade remember. Extracts repeat a few pairs like (10, 10) and
+# ("Msg", 10) over and over.
+SCALAR_CACHE_SIZE = 4096
+
+def _as_object_array(values, length=None):
+    """scalar | list | Series | ndarray -> 1-d ndarray"""
+    if np.ndim(values) == 0:
+        values = [values] * (1 if length is None else length)
+    arr = np.asarray(values)
+    if arr.dtype.kind not in "biuf":
+        arr = np.asarray(values, dtype=object)
+    return arr.ravel()
+
+def _to_float_or_nan(value):
     try:
-        # duck typing nonsense
-        value_as_float = float(value)
-        if math.isnan(value_as_float):
-            return False
-        else:
-            return True
+        return float(value)
     except:
-        return False
+        return np.nan
+
+def _parse_floats(arr, skip=None):
+    """ndarray -> float ndarray, NaN where the value is not numeric.
+
+    Rows where skip is True are known not to be numbers and are not parsed.
+    """
+    if arr.dtype.kind in "biuf":
+        return arr.astype(float)
+    floats = np.full(len(arr), np.nan)
+    to_parse = np.ones(len(arr), dtype=bool) if skip is None else ~skip
+    try:
+        # fast path: every remaining value converts with float()
+        floats[to_parse] = arr[to_parse].astype(float)
+    except (ValueError, TypeError):
+        floats[to_parse] = np.fromiter((_to_float_or_nan(v) for v in arr[to_parse]),
+                                       dtype=float, count=to_parse.sum())
+    return floats
+
+def _index_labels(values, rows):
+    """Series | array-like, int[] -> list of index labels for rows"""
+    index = getattr(values, "index", None)
+    if index is not None and not callable(index):
+        return list(index[rows])
+    return [int(row) for row in rows]
+
+# str[] -> boolean[]
+def are_numeric(values):
+    """Batch version of is_numeric."""
+    arr = _as_object_array(values)
+    return ~np.isnan(_parse_floats(arr))
+
+# str[] -> (float[], str[])
+def split_scores(scores, known_codes=None):
+    """Splits raw scores into numbers and everything else.
+
+    known_codes, a list of values that aren't numbers (eg grade codes), are
+    skipped instead of tried as numbers, so columns mostly of numbers and
+    known codes take the fast path of _parse_floats.
+
+    Returns:
+    (values: float ndarray, NaN where the score isn't numeric,
+     codes: object ndarray of the scores that aren't numeric (letter
+        grades, grade codes, blanks), None where the score is numeric)
+    """
+    arr = _as_object_array(scores)
+    skip = None
+    if known_codes is not None and arr.dtype == object:
+        skip = pd.Series(arr).isin(known_codes).values
+    values = _parse_floats(arr, skip=skip)
+    codes = np.where(np.isnan(values), arr.astype(object), None)
+    return values, codes
+
+# (float[], str[]) -> str[]
+def join_scores(values, codes):
+    """Inverse of split_scores: the code where there is one, else the value.
+
+    Returns a Series indexed like values if it is one, else an ndarray.
+    """
+    code_arr = _as_object_array(codes)
+    joined = np.where(pd.isnull(code_arr), _as_object_array(values).astype(object), code_arr)
+    index = getattr(values, "index", None)
+    if index is not None and not callable(index):
+        return pd.Series(joined, index=index, dtype=object)
+    return joined
+
+# float[] -> ("A","B","C","D","F")[]
+def percentages_to_letter_grades(percentages):
+    """Batch version of percentage_grade_to_letter_grade. NaN -> None."""
+    percentages = np.asarray(percentages, dtype=float)
+    letters = BINNED_LETTER_GRADES[np.searchsorted(LETTER_GRADE_BINS, np.nan_to_num(percentages))]
+    letters[np.isnan(percentages)] = None
+    return letters
+
+# float[] -> int[5] | int[num_groups, 5]
+def letter_grade_counts(percentages, group_codes=None, num_groups=None):
+    """Counts of A, B, C, D and F in an array of percentage grades.
+
+    Percentages are binned against the letter grade cutoffs with a single
+    np.searchsorted. NaN percentages (ignored grades) are not counted.
+
+    Positional args:
+    percentages: float[] -- percentage grades.
+    group_codes: int[]? -- (optional) group of each grade, from 0 to
+        num_groups - 1. Grades with a negative code are not counted.
+    num_groups: int? -- (optional) number of groups; required with group_codes.
+
+    Returns:
+    int[5] of counts in LETTER_GRADES order, or int[num_groups, 5] with
+    group_codes.
+    """
+    percentages = np.asarray(percentages, dtype=float)
+    is_counted = ~np.isnan(percentages)
+    if group_codes is not None:
+        group_codes = np.asarray(group_codes)
+        is_counted &= group_codes >= 0
+    # searchsorted bins are ordered F..A; LETTER_GRADES is A..F
+    letter_indexes = (len(LETTER_GRADES) - 1) - np.searchsorted(LETTER_GRADE_BINS, percentages[is_counted])
+    if group_codes is None:
+        return np.bincount(letter_indexes, minlength=len(LETTER_GRADES))
+    flat_indexes = group_codes[is_counted] * len(LETTER_GRADES) + letter_indexes
+    counts = np.bincount(flat_indexes, minlength=num_groups * len(LETTER_GRADES))
+    return counts.reshape(num_groups, len(LETTER_GRADES))
+
+def decode_scores(scores, max_scores):
+    """Decodes raw Score / ScorePossible values in one pass.
+
+    Positional args:
+    scores: Series | array-like of raw scores: numbers, numeric strings,
+        letter grades or grade codes.
+    max_scores: Series | array-like | scalar of raw possible scores.
+
+    Returns:
+    DecodedScores(
+        percentages: float64 ndarray, NaN where the grade is ignored or invalid,
+        letters: object ndarray of "A" - "F", None where ignored or invalid,
+        statuses: object ndarray of ScoreStatus values,
+        invalid_rows: list of the index labels of invalid rows (positions
+            if scores has no index)
+    )
+    """
+    score_arr = _as_object_array(scores)
+    max_arr = _as_object_array(max_scores, length=len(score_arr))
+    if len(max_arr) != len(score_arr):
+        raise ValueError("Got {} scores but {} max scores".format(len(score_arr), len(max_arr)))
+
+    if score_arr.dtype == object:
+        is_missing = score_arr == GradeCodes.Missing.value
+        is_excused = score_arr == GradeCodes.Excused.value
+        is_incomplete = score_arr == GradeCodes.Incomplete.value
+        is_blank = score_arr == ""
+        letter_masks = {letter: (score_arr == letter) | (score_arr == letter.lower())
+                            for letter in LETTER_GRADES}
+    else:
+        is_missing = is_excused = is_incomplete = is_blank = np.zeros(len(score_arr), dtype=bool)
+        letter_masks = {letter: is_blank for letter in LETTER_GRADES}
+    is_letter = np.logical_or.reduce(list(letter_masks.values()))
+    is_code = is_missing | is_excused | is_incomplete | is_blank | is_letter
+
+    score_floats = _parse_floats(score_arr, skip=is_code)
+    max_floats = _parse_floats(max_arr)
+
+    statuses = np.full(len(score_arr), ScoreStatus.Invalid.value, dtype=object)
+    percentages = np.full(len(score_arr), np.nan)
+    letters = np.full(len(score_arr), None, dtype=object)
+
+    # numeric scores: need a numeric, nonzero max score and a non-negative
+    # score. Percentages over 100 (extra credit) are capped at 100.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        numeric_percentages = np.clip(score_floats / max_floats * 100, 0, 100)
+    is_numeric_score = (~np.isnan(score_floats) & (score_floats >= 0) &
+                        ~np.isnan(max_floats) & (max_floats != 0) &
+                        ~np.isnan(numeric_percentages))
+    percentages[is_numeric_score] = numeric_percentages[is_numeric_score]
+    letters[is_numeric_score] = percentages_to_letter_grades(numeric_percentages[is_numeric_score])
+    statuses[is_numeric_score] = ScoreStatus.Numeric.value
+
+    for letter, mask in letter_masks.items():
+        percentages[mask] = LETTER_GRADE_PERCENTAGES[letter]
+        letters[mask] = letter
+    statuses[is_letter] = ScoreStatus.Letter.value
+
+    # Missing counts as a zero; Excused, Incomplete and blank are ignored.
+    percentages[is_missing] = float(0)
+    letters[is_missing] = "F"
+    statuses[is_missing] = ScoreStatus.Missing.value
+    statuses[is_excused] = ScoreStatus.Excused.value
+    statuses[is_incomplete] = ScoreStatus.Incomplete.value
+    statuses[is_blank] = ScoreStatus.Blank.value
+
+    invalid_rows = np.flatnonzero(statuses == ScoreStatus.Invalid.value)
+    return DecodedScores(percentages, letters, statuses, _index_labels(scores, invalid_rows))
+
+# str -> boolean
+def is_numeric(value):
+    return bool(are_numeric([value])[0])
 
 # int | float -> float
 def calc_percentage(score, max_score):
@@ -29,42 +255,50 @@ def calc_percentage(score, max_score):
     else:
         return percentage
 
-# string | float | int -> float | None
-def to_percentage_grade(score, max_score):
+# NaN is the one value that isn't equal to itself, so every NaN would get
+# its own cache entry. They're all replaced with this one.
+_NAN = float("nan")
 
-    if is_numeric(score):
-        # if score is numeric but max score is not numeric,
-        # raise an exception
-        if not is_numeric(max_score):
-            raise ValueError("max_score {} is not numeric!".format(max_score))
-        else:
-            return calc_percentage(float(score), float(max_score))
-
-    # if score is not numeric and it's a string,
-    # try to parse it as a letter grade.
-    elif isinstance(score, str):
-        if score == GradeCodes.Missing.value:
-            return float(0)
-        elif score == "":
-            return None 
-        elif (score == GradeCodes.Excused.value or
-              score == GradeCodes.Incomplete.value):
-            return None
-        elif score.upper() == "A":
-            return np.mean((LetterGradeCutoffs.A.value, LetterGradeCutoffs.B.value))
-        elif score.upper() == "B":
-            return np.mean((LetterGradeCutoffs.B.value, LetterGradeCutoffs.C.value))
-        elif score.upper() == "C":
-            return np.mean((LetterGradeCutoffs.C.value, LetterGradeCutoffs.D.value))
-        elif score.upper() == "D":
-            return np.mean((LetterGradeCutoffs.D.value, LetterGradeCutoffs.F.value))
-        elif score.upper() == "F":
-            return np.mean((LetterGradeCutoffs.F.value, LetterGradeCutoffs.Zero.value))
-        else:
-            raise ValueError("Did not recognize letter grade: {}".format(score))
+def _normalize_scalar(value):
+    """Makes equal scores share a cache key: numpy scalars become python
+    scalars and every NaN becomes _NAN."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return _NAN
+    return value
 
-    else:
-        raise ValueError("Bad input: score {}".format(score))
+@lru_cache(maxsize=SCALAR_CACHE_SIZE)
+def _decode_scalar(score, max_score):
+    """-> (percentage: float | None, letter: str | None, is_valid: bool)
+
+    Invalid pairs are returned rather than raised so they're cached too.
+    """
+    decoded = decode_scores([score], [max_score])
+    if decoded.invalid_rows:
+        return (None, None, False)
+    percentage_grade = decoded.percentages[0]
+    percentage_grade = None if np.isnan(percentage_grade) else float(percentage_grade)
+    return (percentage_grade, decoded.letters[0], True)
+
+def decode_scalar(score, max_score):
+    """Cached decode_scores of one score. Raises ValueError for bad inputs."""
+    percentage_grade, letter, is_valid = _decode_scalar(_normalize_scalar(score),
+                                                        _normalize_scalar(max_score))
+    if not is_valid:
+        raise ValueError("Bad inputs: score {}, max_score {}".format(score, max_score))
+    return (percentage_grade, letter)
+
+def get_scalar_cache_info():
+    """-> functools cache info (hits, misses, maxsize, currsize) of the scalar converters"""
+    return _decode_scalar.cache_info()
+
+def clear_scalar_cache():
+    _decode_scalar.cache_clear()
+
+# string | float | int -> float | None
+def to_percentage_grade(score, max_score):
+    return decode_scalar(score, max_score)[0]
 
 # int | float | None -> str | None
 def percentage_grade_to_letter_grade(percentage_grade):
@@ -85,29 +319,4 @@ def percentage_grade_to_letter_grade(percentage_grade):
 
 # string | float | int -> ("A","B","C","D","F") | None
 def to_letter_grade(score, max_score):
-
-    if is_numeric(score):
-        if is_numeric(max_score):
-            try:
-                percentage_grade = to_percentage_grade(float(score), float(max_score))
-                return percentage_grade_to_letter_grade(percentage_grade)
-            except ValueError:
-                raise ValueError("Bad inputs: score {}, max_score {}".format(score, max_score))
-        else:
-            raise ValueError("max_score {} is not numeric!".format(max_score))
-
-    elif isinstance(score, str):
-        if score == GradeCodes.Missing.value:
-            return "F"
-        elif score == "":
-            return None 
-        elif (score == GradeCodes.Excused.value or
-              score == GradeCodes.Incomplete.value):
-            return None
-        elif score.upper() in ("A", "B", "C", "D", "F"):
-            return score.upper()
-        else:
-            raise ValueError("Cannot parse as letter grade or code: {}".format(score))
-
-    else:
-        raise ValueError("Bad input: score {}, max_score {}".format(score, max_score))
+    return decode_scalar(score, max_score)[1]
@@ -3,14 +3,23 @@ import numpy as np
 from random import random, randint, choices, choice
 import math
 import string
-from enums import LetterGradeCutoffs, GradeCodes
+import pandas as pd
+from enums import LetterGradeCutoffs, GradeCodes, ScoreStatus
 
 from gradeconvert import (
         is_numeric,
         calc_percentage,
         to_percentage_grade,
         to_letter_grade,
-        percentage_grade_to_letter_grade
+        percentage_grade_to_letter_grade,
+        are_numeric,
+        decode_scores,
+        letter_grade_counts,
+        split_scores,
+        join_scores,
+        get_scalar_cache_info,
+        clear_scalar_cache,
+        LETTER_GRADES
    ) 
 
 class ToLetterGrade(unittest.TestCase):
@@ -286,5 +295,134 @@ class IsNumeric(unittest.TestCase):
         self.assertFalse(is_numeric(""))
 
 
+class DecodeScores(unittest.TestCase):
+
+    scores = [85, "10", "Msg", "a", "", "Exc", "Inc", "wkajfwe", -10, None, 9001, "B"]
+    max_scores = [100, "20", "", "", 20, 20, 20, "", 100, 100, 100, "weh"]
+
+    def test__should_match_scalar_conversions(self):
+        decoded = decode_scores(self.scores, self.max_scores)
+        for i, (score, max_score) in enumerate(zip(self.scores, self.max_scores)):
+            if i in decoded.invalid_rows:
+                self.assertRaises(ValueError, lambda: to_percentage_grade(score, max_score))
+                continue
+            percentage_grade = to_percentage_grade(score, max_score)
+            if percentage_grade is None:
+                self.assertTrue(np.isnan(decoded.percentages[i]))
+            else:
+                self.assertEqual(decoded.percentages[i], percentage_grade)
+            self.assertEqual(decoded.letters[i], to_letter_grade(score, max_score))
+
+    def test__should_report_statuses(self):
+        decoded = decode_scores(self.scores, self.max_scores)
+        self.assertEqual(list(decoded.statuses), [
+            ScoreStatus.Numeric.value,
+            ScoreStatus.Numeric.value,
+            ScoreStatus.Missing.value,
+            ScoreStatus.Letter.value,
+            ScoreStatus.Blank.value,
+            ScoreStatus.Excused.value,
+            ScoreStatus.Incomplete.value,
+            ScoreStatus.Invalid.value,
+            ScoreStatus.Invalid.value,
+            ScoreStatus.Invalid.value,
+            ScoreStatus.Numeric.value,
+            ScoreStatus.Letter.value,
+        ])
+
+    def test__should_collect_all_invalid_rows(self):
+        decoded = decode_scores(self.scores, self.max_scores)
+        self.assertEqual(decoded.invalid_rows, [7, 8, 9])
+
+    def test__should_report_invalid_rows_by_series_index(self):
+        scores = pd.Series(["A", "1o12", 10], index=["x", "y", "z"])
+        decoded = decode_scores(scores, pd.Series(["", 100, "weh"], index=scores.index))
+        self.assertEqual(decoded.invalid_rows, ["y", "z"])
+
+    def test__should_accept_scalar_max_score(self):
+        decoded = decode_scores(np.array([50.0, 100.0, 5.0]), 100)
+        self.assertEqual(list(decoded.percentages), [50.0, 100.0, 5.0])
+        self.assertEqual(list(decoded.letters), ["F", "A", "F"])
+
+    def test__should_return_float_percentages(self):
+        decoded = decode_scores(self.scores, self.max_scores)
+        self.assertEqual(decoded.percentages.dtype, np.float64)
+
+
+class AreNumeric(unittest.TestCase):
+
+    def test__should_match_is_numeric(self):
+        values = [1, 2.5, "86.229", "A", "", None, math.nan, "1o12"]
+        self.assertEqual(list(are_numeric(values)), [is_numeric(v) for v in values])
+
+
+class LetterGradeCounts(unittest.TestCase):
+
+    percentages = [100, 95.5, 89, 89.01, 79, 70, 69, 60, 59, 0, np.nan, 30]
+
+    def test__should_match_percentage_grade_to_letter_grade(self):
+        expected_letters = [percentage_grade_to_letter_grade(p) for p in self.percentages
+                                if not np.isnan(p)]
+        expected_counts = [expected_letters.count(letter) for letter in LETTER_GRADES]
+        self.assertEqual(list(letter_grade_counts(self.percentages)), expected_counts)
+
+    def test__should_skip_ignored_grades(self):
+        self.assertEqual(letter_grade_counts([np.nan, np.nan]).sum(), 0)
+
+    def test__should_count_per_group(self):
+        group_codes = [0, 1, 1, 0, 2, 2, 0, 1, 1, 0, 2, -1]
+        counts = letter_grade_counts(self.percentages, group_codes, 3)
+        self.assertEqual(counts.shape, (3, 5))
+        self.assertEqual(list(counts[0]), [2, 0, 0, 1, 1])
+        self.assertEqual(list(counts[1]), [1, 1, 0, 1, 1])
+        self.assertEqual(list(counts[2]), [0, 0, 2, 0, 0])
+
+
+class SplitScores(unittest.TestCase):
+
+    scores = ["86.5", "A", "", "Msg", "0", "Exc", "f"]
+
+    def test__should_split_numbers_from_codes(self):
+        values, codes = split_scores(self.scores)
+        np.testing.assert_array_equal(values, [86.5, np.nan, np.nan, np.nan, 0, np.nan, np.nan])
+        self.assertEqual(list(codes), [None, "A", "", "Msg", None, "Exc", "f"])
+
+    def test__should_decode_like_raw_scores_once_joined(self):
+        joined = join_scores(*split_scores(self.scores))
+        expected = decode_scores(self.scores, 100)
+        actual = decode_scores(joined, 100)
+        np.testing.assert_array_equal(actual.percentages, expected.percentages)
+        self.assertEqual(list(actual.letters), list(expected.letters))
+
+    def test__should_keep_series_index(self):
+        values = pd.Series([86.5, np.nan], index=[3, 7])
+        codes = pd.Series([np.nan, "A"], index=[3, 7], dtype="category")
+        self.assertEqual(join_scores(values, codes).to_dict(), {3: 86.5, 7: "A"})
+
+class ScalarCache(unittest.TestCase):
+
+    def setUp(self):
+        clear_scalar_cache()
+
+    def test__should_reuse_repeated_pairs(self):
+        for _ in range(3):
+            to_percentage_grade(10, 10)
+            to_letter_grade(GradeCodes.Missing.value, 10)
+        info = get_scalar_cache_info()
+        self.assertEqual((info.hits, info.misses), (4, 2))
+
+    def test__should_share_entries_between_equal_scores(self):
+        self.assertRaises(ValueError, lambda: to_letter_grade(float("nan"), 10))
+        self.assertRaises(ValueError, lambda: to_letter_grade(np.float64("nan"), np.int64(10)))
+        to_letter_grade(10.0, 10)
+        to_letter_grade(np.float64(10), 10)
+        info = get_scalar_cache_info()
+        self.assertEqual((info.hits, info.misses), (2, 2))
+
+    def test__should_keep_throwing_on_bad_inputs(self):
+        for _ in range(2):
+            self.assertRaises(ValueError, lambda: to_percentage_grade("A+", 10))
+        self.assertEqual(get_scalar_cache_info().hits, 1)
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,198 @@
+"""Stage-level timing for the report pipeline.
+
+Disabled unless GB_PROFILE=1 is set (or main.py is run with --profile).
+When enabled, every stage records its wall time, CPU time, the change of
+the process' RSS over the stage, and the process' peak RSS so far (over
+its whole life, not just the stage), both for data loading and for each
+report. write_run_summary writes the records and per-stage totals as JSON
+and CSV.
+
+With GB_PROFILE_TOP=N (or --profile-top N), each report is also run under
+cProfile and the profiles of the N slowest reports are dumped to
+PROFILE_DIR.
+"""
+import os
+import os.path as path
+import time
+import json
+import csv
+import cProfile
+import functools
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # not available on windows
+    resource = None
+
+ENABLED = os.environ.get("GB_PROFILE", "0") == "1"
+PROFILE_TOP_N = int(os.environ.get("GB_PROFILE_TOP", "0"))
+PROFILE_DIR = "./profiles"
+
+# stage records: {report, stage, wall_s, cpu_s, rss_change_mb, process_peak_rss_mb}
+RECORDS = []
+RECORD_FIELDS = ["report", "stage", "wall_s", "cpu_s", "rss_change_mb", "process_peak_rss_mb"]
+# report being rendered by this process, None while loading data
+CURRENT_REPORT = None
+# [(wall_s, report_name, profile_filepath)] of the slowest profiled reports
+PROFILED_REPORTS = []
+
+def configure(enabled=None, profile_top_n=None):
+    global ENABLED, PROFILE_TOP_N
+    if enabled is not None:
+        ENABLED = enabled
+    if profile_top_n is not None:
+        PROFILE_TOP_N = profile_top_n
+        ENABLED = ENABLED or profile_top_n > 0
+    # so that worker processes which don't fork pick up the same settings
+    os.environ["GB_PROFILE"] = "1" if ENABLED else "0"
+    os.environ["GB_PROFILE_TOP"] = str(PROFILE_TOP_N)
+
+def get_peak_rss_mb():
+    """-> the highest RSS of this process since it started, not of any one stage"""
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+def get_rss_mb():
+    """-> the current RSS of this process, or None where /proc isn't available"""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+    except (IOError, ValueError, IndexError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / 2.0 ** 20
+
+@contextmanager
+def stage(stage_name):
+    """Records the time spent in the with block as a stage of the current report."""
+    if not ENABLED:
+        yield
+        return
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    rss_start = get_rss_mb()
+    try:
+        yield
+    finally:
+        rss_end = get_rss_mb()
+        RECORDS.append({
+            "report": CURRENT_REPORT,
+            "stage": stage_name,
+            "wall_s": time.perf_counter() - wall_start,
+            "cpu_s": time.process_time() - cpu_start,
+            # memory the stage kept (or freed), not its own peak
+            "rss_change_mb": rss_end - rss_start if None not in (rss_start, rss_end) else None,
+            "process_peak_rss_mb": get_peak_rss_mb(),
+        })
+
+def timed(stage_name):
+    """Decorator: records every call of the function as a stage."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(stage_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def get_profile_filepath(report_name):
+    return path.join(PROFILE_DIR, "{}.prof".format(report_name.replace(" ", "_")))
+
+def keep_slowest_profiles(profiled_reports, n):
+    """Deletes the dumps of all but the n slowest profiled reports. Returns those n."""
+    profiled_reports = sorted(profiled_reports, key=lambda p: p[0], reverse=True)
+    for _, _, profile_filepath in profiled_reports[n:]:
+        if path.exists(profile_filepath):
+            os.remove(profile_filepath)
+    return profiled_reports[:n]
+
+@contextmanager
+def report(report_name):
+    """Attributes the stages in the with block to report_name, and times the whole report."""
+    global CURRENT_REPORT, PROFILED_REPORTS
+    if not ENABLED:
+        yield
+        return
+
+    CURRENT_REPORT = report_name
+    profiler = cProfile.Profile() if PROFILE_TOP_N > 0 else None
+    wall_start = time.perf_counter()
+    try:
+        with stage("total"):
+            if profiler is not None:
+                profiler.enable()
+            try:
+                yield
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+    finally:
+        CURRENT_REPORT = None
+
+    if profiler is not None:
+        wall_s = time.perf_counter() - wall_start
+        # only dump the profile if it's one of the slowest so far
+        if len(PROFILED_REPORTS) < PROFILE_TOP_N or wall_s > min(p[0] for p in PROFILED_REPORTS):
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            profile_filepath = get_profile_filepath(report_name)
+            profiler.dump_stats(profile_filepath)
+            PROFILED_REPORTS.append((wall_s, report_name, profile_filepath))
+            PROFILED_REPORTS = keep_slowest_profiles(PROFILED_REPORTS, PROFILE_TOP_N)
+
+def pop_records():
+    """Returns and forgets the records of this process, eg to send them from a worker."""
+    records = list(RECORDS)
+    del RECORDS[:]
+    return records
+
+def reset():
+    """Forgets every record and profiled report of this process."""
+    global PROFILED_REPORTS
+    del RECORDS[:]
+    PROFILED_REPORTS = []
+
+def add_records(records):
+    RECORDS.extend(records)
+
+def summarize(records):
+    """-> [{stage, count, wall_s, cpu_s, max_wall_s, max_rss_change_mb, process_peak_rss_mb}] totals per stage"""
+    stages = {}
+    for record in records:
+        summary = stages.setdefault(record["stage"], {
+            "stage": record["stage"],
+            "count": 0,
+            "wall_s": 0.0,
+            "cpu_s": 0.0,
+            "max_wall_s": 0.0,
+            "max_rss_change_mb": None,
+            "process_peak_rss_mb": None,
+        })
+        summary["count"] += 1
+        summary["wall_s"] += record["wall_s"]
+        summary["cpu_s"] += record["cpu_s"]
+        summary["max_wall_s"] = max(summary["max_wall_s"], record["wall_s"])
+        if record["rss_change_mb"] is not None and (summary["max_rss_change_mb"] is None or
+                                                    record["rss_change_mb"] > summary["max_rss_change_mb"]):
+            summary["max_rss_change_mb"] = record["rss_change_mb"]
+        if record["process_peak_rss_mb"] is not None:
+            summary["process_peak_rss_mb"] = max(summary["process_peak_rss_mb"] or 0,
+                                                 record["process_peak_rss_mb"])
+    return sorted(stages.values(), key=lambda s: s["wall_s"], reverse=True)
+
+def write_run_summary(json_filepath, csv_filepath=None, records=None):
+    """Writes stage records and per-stage totals of this run."""
+    records = RECORDS if records is None else records
+    with open(json_filepath, "w") as f:
+        json.dump({
+            "stages": summarize(records),
+            "records": records,
+        }, f, indent=2)
+    if csv_filepath is not None:
+        with open(csv_filepath, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=RECORD_FIELDS)
+            writer.writeheader()
+            writer.writerows(records)
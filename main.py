@@ -1,54 +1,315 @@
-import matplotlib
-matplotlib.use('Agg')
+import os
+import argparse
+import multiprocessing
+import traceback
+from contextlib import contextmanager
 
+import create_gradebook_summary as gb_summary
+import data_access
+import data_checks
+import report_manifest
+import report_rendering
+import instrumentation
 from create_gradebook_summary import create_gradebook_summary
+from data_access import get_report_partitions
 
-if __name__ == "__main__":
+# saved next to the reports, in gb_summary.OUTPUT_DIR
+RUN_SUMMARY_JSON_FILENAME = "run_summary.json"
+RUN_SUMMARY_CSV_FILENAME = "run_summary.csv"
+
+# settings generate_reports changes for the length of a run, read by
+# worker processes which don't fork when they import the modules
+RUN_SETTING_ENV_VARS = ("GB_SOURCE_DIR", "GB_EXTRACT_DATE", "GB_OUTPUT_DIR")
+
+def get_run_summary_filepaths(output_dir=None):
+    """-> (json path, csv path) of the run summary, in output_dir (default: gb_summary.OUTPUT_DIR)"""
+    output_dir = output_dir or gb_summary.OUTPUT_DIR
+    return (os.path.join(output_dir, RUN_SUMMARY_JSON_FILENAME),
+            os.path.join(output_dir, RUN_SUMMARY_CSV_FILENAME))
+
+@contextmanager
+def use_run_dirs(extract_dir=None, output_dir=None):
+    """Points the data at extract_dir and the reports at output_dir in the with
+    block, then puts back the previous settings, so that a later run in the
+    same process doesn't inherit them."""
+    saved_settings = (data_access.SOURCE_DIR, data_access.DATE, gb_summary.OUTPUT_DIR,
+                      {name: os.environ.get(name) for name in RUN_SETTING_ENV_VARS})
+    try:
+        if extract_dir is not None:
+            data_access.use_extract_dir(extract_dir)
+            # also for worker processes which don't fork
+            os.environ["GB_SOURCE_DIR"], os.environ["GB_EXTRACT_DATE"] = data_access.SOURCE_DIR, data_access.DATE
+        if output_dir is not None:
+            os.environ["GB_OUTPUT_DIR"] = gb_summary.OUTPUT_DIR = output_dir
+        yield
+    finally:
+        data_access.SOURCE_DIR, data_access.DATE, gb_summary.OUTPUT_DIR, saved_env = saved_settings
+        for name, value in saved_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+def preload_data():
+    """Loads and preprocesses every frame the reports need, once."""
+    get_report_partitions()
+    data_checks.get_category_weight_totals()
+    data_checks.get_score_anomaly_summary()
+    # forked workers share the compiled template and parsed stylesheet
+    report_rendering.get_render_context()
+
+def init_worker(snapshot):
+    """Pool initializer for platforms that can't fork: restores the parent's dataset."""
+    data_access.restore_cache_snapshot(snapshot)
+
+# (str, str) -> ((str, str), success: bool, err: str | None, stage records[])
+def run_report_job(job):
+    teacher, homeroom = job
+    with instrumentation.report(gb_summary.get_report_name(teacher, homeroom)):
+        try:
+            success, err = create_gradebook_summary(teacher, homeroom), None
+        except Exception:
+            success, err = False, traceback.format_exc()
+    return (job, success, err, instrumentation.pop_records())
+
+# (str, str) -> ((str, str), template_vars: dict | None, err: str | None, stage records[])
+def run_template_vars_job(job):
+    """Like run_report_job, but returns the report's sections instead of saving its PDF."""
+    teacher, homeroom = job
+    with instrumentation.report(gb_summary.get_report_name(teacher, homeroom)):
+        try:
+            template_vars, err = gb_summary.get_report_template_vars(teacher, homeroom), None
+        except Exception:
+            template_vars, err = None, traceback.format_exc()
+    return (job, template_vars, err, instrumentation.pop_records())
+
+# ((str, str), template_vars) -> ((str, str), success: bool, err: str | None, stage records[])
+def run_render_job(render_job):
+    """Like run_report_job, for a report whose sections were already rendered in batch."""
+    job, template_vars = render_job
+    with instrumentation.report(template_vars["report_name"]):
+        try:
+            gb_summary.render_template(template_vars)
+            success, err = True, None
+        except Exception:
+            success, err = False, traceback.format_exc()
+    return (job, success, err, instrumentation.pop_records())
+
+def run_report_jobs(jobs, workers=1, job_fn=run_report_job):
+    """Renders reports for a list of (teacher, homeroom) jobs.
+
+    With workers > 1, jobs are sent to a process pool. Data is loaded once
+    in this process and shared with the workers, by fork where the platform
+    supports it and by a pickled snapshot otherwise.
+
+    job_fn is run_report_job, or run_template_vars_job to only render the
+    reports' sections, eg to merge them into one PDF. With run_render_job,
+    jobs are ((teacher, homeroom), template_vars) of sections rendered in
+    batch, and only their PDFs are saved.
+
+    Returns:
+    list of ((teacher, homeroom), success: bool, err: str | None), in job
+    order. With run_template_vars_job, success is the report's template vars.
+    """
+    preload_data()
+    if workers <= 1:
+        results = [job_fn(job) for job in jobs]
+    else:
+        results = run_report_jobs_in_pool(jobs, workers, job_fn)
+
+    # stage records are kept by the process that rendered the report
+    for _, _, _, records in results:
+        instrumentation.add_records(records)
+    return [(job, success, err) for job, success, err, _ in results]
+
+def run_report_jobs_in_pool(jobs, workers, job_fn=run_report_job):
+    """Like run_report_jobs, but returns results with each worker's stage records."""
+    if "fork" in multiprocessing.get_all_start_methods():
+        # forked workers inherit the loaded dataset.
+        # They also inherit this process' stage records, which they drop.
+        pool = multiprocessing.get_context("fork").Pool(workers, initializer=instrumentation.reset)
+    else:
+        pool = multiprocessing.Pool(workers,
+                                    initializer=init_worker,
+                                    initargs=(data_access.get_cache_snapshot(),))
+    with pool:
+        return pool.map(job_fn, jobs, chunksize=1)
+
+def get_changed_jobs(jobs, manifest):
+    """Returns (jobs whose reports are out of date, {job: fingerprint} of those jobs)"""
+    fingerprints = {}
+    for teacher, homeroom in jobs:
+        report_name = gb_summary.get_report_name(teacher, homeroom)
+        fingerprint = gb_summary.get_report_fingerprint(teacher, homeroom)
+        if not report_manifest.is_up_to_date(manifest, report_name,
+                                             gb_summary.get_report_filepath(report_name),
+                                             fingerprint):
+            fingerprints[(teacher, homeroom)] = fingerprint
+    return [job for job in jobs if job in fingerprints], fingerprints
 
-    teacher_fullname_list = [
-            "Lorena Velasco",
-            "Luz Escobar",
-            "Maria DeSanto",
-            "Beatriz Lopez",
-            "Rebecca Reddicliffe",
-            "Ana Cabrera",
-            "Bethany Jorgensen",
-            "Adriana Soto",
-            "Mayra Velasco",
-            "Liliana Martinez-Vargas",
-            "Ashley McCall",
-            "Lindsay Singer",
-            "Tiffany Humphrey",
-            "Daniel Kim",
-            "Nancy Montoya",
-            "Sara Strasser",
-            "Jennie Vazquez",
-            "Lacey Elliott",
-            "Katelyn Bell",
-            "Agnieszka Opacian",
-            "Marcella Cadena",
-            "Catherine Kompare",
-            "Andrea Lancki",
-            "Jaime McLaughlin",
-            "Christopher Brekke",
-            "Stacy Ambler",
-            "Isidro Lopez",
-            "Priscilla Centeno",
-            "Litaysha Turner",
-            "Mary Iverson"
-        ]
-
-    homeroom_list = [
-       'B312', 'A303', 'A122AM', 'A306', 'A301', 'A206', 'A307', 'A121AM',             
-       'B214', 'B314', 'A302', 'B316', 'B212', 'A207', 'B313', 'B211',                 
-       'A201', 'A203', 'A308', 'A305', 'B317', 'A304', 'B318', 'B217',                 
-       'A107', 'B213', 'A202', 'A309', 'B218', 'A208', 'A108', 'A205',                 
-       'A122PM', 'B216', 'A101', 'A121PM', 'A102', 'A103', 'B115'
-            ]
-
-    for teacher in teacher_fullname_list:
-        for homeroom in homeroom_list:
-            success = create_gradebook_summary(teacher, homeroom)
+def discover_jobs(teachers=None, homerooms=None):
+    """-> sorted (teacher, homeroom) pairs that have data, optionally only
+    those of the given teachers and homerooms"""
+    all_jobs = jobs = get_report_partitions().keys()
+    for name, wanted, index in (("teacher", teachers, 0), ("homeroom", homerooms, 1)):
+        if wanted is None:
+            continue
+        wanted = set(wanted)
+        for value in sorted(wanted - set(job[index] for job in all_jobs)):
+            print("No reports for {} {}".format(name, value))
+        jobs = [job for job in jobs if job[index] in wanted]
+    return jobs
+
+def generate_reports(extract_dir=None, output_dir=None, teachers=None, homerooms=None,
+                     workers=1, incremental=False, batch=False, merged_pdf=None):
+    """Creates the reports of every (teacher, homeroom) pair in the extracts.
+
+    Keyword args:
+    extract_dir: str? -- folder with the four extracts (default: the most
+        recent one in data_access.SOURCE_DIR, or data_access.DATE if set)
+    output_dir: str? -- folder to save reports to (default: gb_summary.OUTPUT_DIR)
+    teachers, homerooms: str[]? -- only create reports of these teachers
+        and homerooms
+    workers: int -- number of processes rendering reports
+    incremental: bool -- only re-render reports whose input rows changed
+        since the last run
+    batch: bool -- compute the sections of every report in one grouped pass
+    merged_pdf: str? -- render every report into this one PDF instead
+
+    Returns:
+    str[] -- paths of the PDFs created
+    """
+    with use_run_dirs(extract_dir, output_dir):
+        return create_reports(teachers, homerooms, workers, incremental, batch, merged_pdf)
+
+def create_reports(teachers, homerooms, workers, incremental, batch, merged_pdf):
+    """generate_reports of the current extract dir, into the current output dir"""
+    os.makedirs(gb_summary.OUTPUT_DIR, exist_ok=True)
+
+    # school-wide exceptions, whichever reports are created. Scores are
+    # checked as the assignments are read.
+    anomalies_filepath = data_checks.write_score_anomalies(gb_summary.OUTPUT_DIR)
+    print("{} student assignments with bad scores, listed in {}".format(
+            len(data_checks.get_score_anomalies_df()), anomalies_filepath))
+    exceptions_filepath = data_checks.write_category_weight_exceptions(gb_summary.OUTPUT_DIR)
+    print("{} classes with category weights not adding up to {}, listed in {}".format(
+            len(data_checks.get_category_weight_exceptions()), data_checks.CATEGORY_WEIGHT_TOTAL,
+            exceptions_filepath))
+
+    # only schedule the (teacher, homeroom) pairs that have data
+    jobs = discover_jobs(teachers, homerooms)
+    print("Found {} reports to create from {}.".format(len(jobs), data_access.get_extract_dir()))
+
+    if incremental:
+        preload_data()
+        manifest_filepath = report_manifest.get_manifest_filepath(gb_summary.OUTPUT_DIR)
+        manifest = report_manifest.load_manifest(manifest_filepath)
+        num_jobs = len(jobs)
+        jobs, fingerprints = get_changed_jobs(jobs, manifest)
+        print("{} of {} reports changed since the last run.".format(len(jobs), num_jobs))
+
+    all_template_vars = None
+    if batch:
+        preload_data()
+        all_template_vars, batch_errors = gb_summary.get_all_report_template_vars(jobs)
+
+    if merged_pdf is not None:
+        if all_template_vars is None:
+            results = run_report_jobs(jobs, workers=workers, job_fn=run_template_vars_job)
+        else:
+            results = [(job, all_template_vars.get(job), batch_errors.get(job)) for job in jobs]
+        template_vars_list = [template_vars for _, template_vars, _ in results if template_vars]
+        gb_summary.render_merged_template(template_vars_list, merged_pdf)
+        print("Merged {} reports into {}".format(len(template_vars_list), merged_pdf))
+    elif all_template_vars is not None:
+        rendered = run_report_jobs([(job, all_template_vars[job]) for job in jobs if job in all_template_vars],
+                                   workers=workers, job_fn=run_render_job)
+        # in job order, with the reports whose sections failed
+        results_by_job = {job: (job, success, err) for job, success, err in rendered}
+        results_by_job.update((job, (job, False, err)) for job, err in batch_errors.items())
+        results = [results_by_job[job] for job in jobs if job in results_by_job]
+    else:
+        results = run_report_jobs(jobs, workers=workers)
+
+    if incremental:
+        for job, success, err in results:
             if success:
-                print("Printed gradebook summary for {}-{}...".format(homeroom, teacher))
+                manifest[gb_summary.get_report_name(*job)] = fingerprints[job]
+        report_manifest.save_manifest(manifest, manifest_filepath)
+
+    report_filepaths = [merged_pdf] if merged_pdf is not None and template_vars_list else []
+    failures = []
+    for (teacher, homeroom), success, err in results:
+        if success:
+            print("Printed gradebook summary for {}-{}...".format(homeroom, teacher))
+            if merged_pdf is None:
+                report_filepaths.append(gb_summary.get_report_filepath(gb_summary.get_report_name(teacher, homeroom)))
+        elif err is not None:
+            failures.append((teacher, homeroom, err))
+
+    for teacher, homeroom, err in failures:
+        print("Failed to print gradebook summary for {}-{}:\n{}".format(homeroom, teacher, err))
+    print("{} reports printed, {} failed.".format(len(results) - len(failures), len(failures)))
+    return report_filepaths
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Create gradebook summary reports.")
+    parser.add_argument("extract_dir", nargs="?", default=None,
+                        help="folder with the four extracts, eg ./source/2018-05-14 "
+                             "(default: the most recent folder of {})".format(data_access.SOURCE_DIR))
+    parser.add_argument("--output-dir", default=None,
+                        help="folder to save reports to (default: {})".format(gb_summary.OUTPUT_DIR))
+    parser.add_argument("--teacher", action="append", default=None, metavar="NAME", dest="teachers",
+                        help="only create reports of this teacher, by full name. Can be repeated.")
+    parser.add_argument("--homeroom", action="append", default=None, dest="homerooms",
+                        help="only create reports of this homeroom. Can be repeated.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes rendering reports (default: 1)")
+    parser.add_argument("--profile", action="store_true",
+                        help="record time and memory of each stage to {} in the output dir".format(
+                            RUN_SUMMARY_JSON_FILENAME))
+    parser.add_argument("--profile-top", type=int, default=None, metavar="N",
+                        help="also dump cProfile stats of the N slowest reports to {}".format(
+                            instrumentation.PROFILE_DIR))
+    parser.add_argument("--incremental", action="store_true",
+                        help="only re-render reports whose input rows changed since the last run")
+    parser.add_argument("--batch", action="store_true",
+                        help="compute the sections of every report in one grouped pass, then save their PDFs")
+    parser.add_argument("--merged-pdf", default=None, metavar="FILE",
+                        help="render every report into one multi-page PDF instead of one PDF per report")
+    parser.add_argument("--debug-html", default=None, metavar="DIR",
+                        help="also save the HTML of every report to DIR")
+    parser.add_argument("--diagrams", choices=gb_summary.DIAGRAM_FORMATS, default=None,
+                        help="grade distribution charts as one inline svg or png per report, "
+                             "or as png files per subject (default: {})".format(gb_summary.DIAGRAM_FORMAT))
+    args = parser.parse_args()
+    if args.incremental and args.merged_pdf is not None:
+        parser.error("--incremental can't skip reports of a --merged-pdf")
+    return args
+
+if __name__ == "__main__":
+    args = parse_args()
+    instrumentation.configure(enabled=args.profile or None, profile_top_n=args.profile_top)
+    if args.debug_html is not None:
+        os.environ["GB_DEBUG_HTML_DIR"] = report_rendering.DEBUG_HTML_DIR = args.debug_html
+    if args.diagrams is not None:
+        # also for worker processes which don't fork
+        os.environ["GB_DIAGRAM_FORMAT"] = gb_summary.DIAGRAM_FORMAT = args.diagrams
+
+    generate_reports(extract_dir=args.extract_dir,
+                     output_dir=args.output_dir,
+                     teachers=args.teachers,
+                     homerooms=args.homerooms,
+                     workers=args.workers,
+                     incremental=args.incremental,
+                     batch=args.batch,
+                     merged_pdf=args.merged_pdf)
 
+    if instrumentation.ENABLED:
+        instrumentation.write_run_summary(*get_run_summary_filepaths(args.output_dir))
+        if instrumentation.PROFILE_TOP_N > 0:
+            # each worker kept its own slowest reports; keep the slowest overall
+            instrumentation.keep_slowest_profiles(
+                    [(record["wall_s"], record["report"], instrumentation.get_profile_filepath(record["report"]))
+                        for record in instrumentation.RECORDS if record["stage"] == "total"],
+                    instrumentation.PROFILE_TOP_N)
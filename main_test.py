@@ -0,0 +1,40 @@
+import unittest
+import os
+import os.path as path
+import tempfile
+import data_access
+import extract_cache
+import create_gradebook_summary as gb_summary
+import main
+from synthetic_extracts import generate_extracts
+
+class GenerateReports(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.extract_dir = path.join(self.tmp_dir.name, "source", "2018-05-14")
+        generate_extracts(self.extract_dir, num_schools=1, teachers_per_school=2,
+                          students_per_homeroom=5, assignments_per_class=4)
+        self.saved_cache_setting = extract_cache.ENABLED
+        extract_cache.ENABLED = False
+        data_access.clear_caches()
+
+    def tearDown(self):
+        extract_cache.ENABLED = self.saved_cache_setting
+        data_access.clear_caches()
+        self.tmp_dir.cleanup()
+
+    def test__should_restore_settings_after_run(self):
+        settings = (data_access.SOURCE_DIR, data_access.DATE, gb_summary.OUTPUT_DIR,
+                    [os.environ.get(name) for name in main.RUN_SETTING_ENV_VARS])
+        output_dir = path.join(self.tmp_dir.name, "reports")
+        # no reports are rendered, only the school-wide exceptions are written
+        report_filepaths = main.generate_reports(self.extract_dir, output_dir=output_dir, teachers=["Nobody"])
+
+        self.assertEqual(report_filepaths, [])
+        self.assertTrue(path.isfile(path.join(output_dir, "score_anomalies.csv")))
+        self.assertEqual((data_access.SOURCE_DIR, data_access.DATE, gb_summary.OUTPUT_DIR,
+                          [os.environ.get(name) for name in main.RUN_SETTING_ENV_VARS]), settings)
+
+if __name__ == "__main__":
+    unittest.main()
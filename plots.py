@@ -1,14 +1,30 @@
 import matplotlib
+# reports are drawn without a display
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 matplotlib.rcParams.update({'font.size': 22})
+from matplotlib.figure import Figure
 import numpy as np
-from gradeconvert import to_letter_grade
+import base64
+import io
+from gradeconvert import decode_scores, letter_grade_counts, LETTER_GRADES, LETTER_GRADE_COLORS
+
+# sprites lay out subjects in rows of SPRITE_COLUMNS charts, each the size
+# of a single subject's figure
+SPRITE_COLUMNS = 3
+SPRITE_CHART_SIZE = (6.4, 4.8)
+SPRITE_MIME_TYPES = {"svg": "image/svg+xml", "png": "image/png"}
+
+# figure reused by every sprite drawn in this process
+SPRITE_FIGURE = None
 
 def create_lettergrade_breakdown_diagram(**kwargs):
     """Returns URL of a diagram of letter grade distribution for given grade data.
     
     Keyword args:
     grades: float[] -- list of percentage grades as floats.
+    letter_grade_counts: int[5]? -- (optional) counts of A, B, C, D and F,
+        eg a row of gbutils.get_lettergrade_histogram. Used instead of grades.
     output_url: str -- valid url to save diagram to. 
     label: str? -- (optional) label for diagram
 
@@ -16,44 +32,29 @@ def create_lettergrade_breakdown_diagram(**kwargs):
     (success: bool, err: Error | None)
     """
     grades = kwargs.get("grades", None)
+    grade_counts = kwargs.get("letter_grade_counts", None)
     output_url = kwargs.get("output_url", None)
     diagram_label = kwargs.get("label", None)
 
-    if grades is None:
+    if grades is None and grade_counts is None:
         raise ValueError("Missing required keyword argument grades")
     if output_url is None:
         raise ValueError("Missing required keyword argument output_url")
     
-    def create_pie_chart_image(letter_grades, output_url):
+    def create_pie_chart_image(grade_counts, output_url):
         """Creates image at URL. Returns success(bool), err(Error | None)
         
         Positional args:
-        letter_grades: str[] of type ("A" | "B" | "C" | "D" | "F").
+        grade_counts: int[5] of counts of ("A", "B", "C", "D", "F").
         output_url: str of valid URL to save image to.
 
         Returns:
         (success: bool, err: Error | None)
         """
-        # count number of students with each grade
-        letters = ["A", "B", "C", "D", "F"]
-        colormap = {"A":"green", 
-                "B": "yellowgreen", 
-                "C": "yellow", 
-                "D": "orange", 
-                "F": "red"}
-        # create pie chart sizes and label them with corresponding letter grade
-        letter_grade_counts = {letter: letter_grades.count(letter) for letter in letters}
-        #letter_grade_counts = {letter: letter_grades.count(letter) for letter in letters 
-               # if letter_grades.count(letter) != 0}
-        grade_counts = []
-        labels = []
-        colors = []
-        # put labels and colors in correct order, skipping letter grades for which
-        # there are no letter grades
-        for letter, count in letter_grade_counts.items():
-            labels.append(letter)
-            grade_counts.append(count)
-            colors.append(colormap[letter])
+        # label bars with corresponding letter grade
+        labels = list(LETTER_GRADES)
+        colors = [LETTER_GRADE_COLORS[letter] for letter in LETTER_GRADES]
+        grade_counts = list(grade_counts)
         # create pie chart
         def make_autopct(values):
             def my_autopct(pct):
@@ -81,7 +82,58 @@ def create_lettergrade_breakdown_diagram(**kwargs):
             plt.clf()
             plt.close("all")
 
-    letter_grades = [to_letter_grade(grade, 100) for grade in grades]
-    letter_grades = [grade for grade in letter_grades if grade is not None]
+    if grade_counts is None:
+        # count number of students with each grade
+        decoded_grades = decode_scores(grades, 100)
+        if decoded_grades.invalid_rows:
+            raise ValueError("Bad grades in rows {}".format(decoded_grades.invalid_rows))
+        grade_counts = letter_grade_counts(decoded_grades.percentages)
+
+    return create_pie_chart_image(grade_counts, output_url)
+
+def draw_lettergrade_bars(ax, grade_counts, label=None):
+    """Draws a bar chart of counts of ("A", "B", "C", "D", "F") on ax."""
+    colors = [LETTER_GRADE_COLORS[letter] for letter in LETTER_GRADES]
+    ax.bar(np.arange(len(LETTER_GRADES)), list(grade_counts), color=colors, tick_label=list(LETTER_GRADES))
+    if label is not None:
+        ax.set_title(label)
+
+def get_sprite_figure():
+    """-> the cleared figure of this process, created on first use"""
+    global SPRITE_FIGURE
+    if SPRITE_FIGURE is None:
+        # a bare Figure isn't registered with pyplot, so there is no global
+        # state to tear down between reports
+        SPRITE_FIGURE = Figure()
+    SPRITE_FIGURE.clf()
+    return SPRITE_FIGURE
+
+def create_lettergrade_breakdown_sprite(grade_counts_by_subject, image_format="svg"):
+    """Draws the letter grade distribution of every subject as subplots of one image.
+
+    Positional args:
+    grade_counts_by_subject: df -- subject x ("A", "B", "C", "D", "F") counts,
+        eg the output of gbutils.get_lettergrade_histogram with subjects.
+
+    Keyword args:
+    image_format: "svg" | "png"
+
+    Returns:
+    str -- data URI of the image, to use as an img src
+    """
+    if image_format not in SPRITE_MIME_TYPES:
+        raise ValueError("Unknown sprite format {}".format(image_format))
+
+    num_charts = max(len(grade_counts_by_subject), 1)
+    num_cols = min(num_charts, SPRITE_COLUMNS)
+    num_rows = -(-num_charts // num_cols)
+    fig = get_sprite_figure()
+    fig.set_size_inches(SPRITE_CHART_SIZE[0] * num_cols, SPRITE_CHART_SIZE[1] * num_rows)
+    for i, (subject_name, grade_counts) in enumerate(grade_counts_by_subject.iterrows()):
+        draw_lettergrade_bars(fig.add_subplot(num_rows, num_cols, i + 1), grade_counts.values, subject_name)
+    fig.tight_layout()
 
-    return create_pie_chart_image(letter_grades, output_url)
+    image = io.BytesIO()
+    fig.savefig(image, format=image_format)
+    return "data:{};base64,{}".format(SPRITE_MIME_TYPES[image_format],
+                                      base64.b64encode(image.getvalue()).decode("ascii"))
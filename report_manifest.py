@@ -0,0 +1,74 @@
+"""Manifest of the inputs each report was last rendered from.
+
+Used by incremental runs: a report is only re-rendered if the fingerprint
+of its input rows (or of the rendering code) changed since the manifest was
+written, or if its PDF is gone. Each output dir has its own manifest, of
+the PDFs in it.
+"""
+import os
+import os.path as path
+import json
+from hashlib import md5
+import pandas as pd
+
+# saved in the output dir of the reports it lists
+MANIFEST_FILENAME = "reports_manifest.json"
+
+# files whose contents change what a report looks like
+RENDER_FILES = (
+    "create_gradebook_summary.py",
+    "data_checks.py",
+    "gbutils.py",
+    "gradeconvert.py",
+    "enums.py",
+    "report_rendering.py",
+    "plots.py",
+    "svg_plots.py",
+    "templates/gb_report_template.html",
+    "templates/typography.css",
+)
+
+CACHED_RENDER_CODE_VERSION = None
+def get_render_code_version():
+    """-> md5 of the rendering code and templates"""
+    global CACHED_RENDER_CODE_VERSION
+    if CACHED_RENDER_CODE_VERSION is not None:
+        return CACHED_RENDER_CODE_VERSION
+
+    h = md5()
+    code_dir = path.dirname(path.abspath(__file__))
+    for filename in RENDER_FILES:
+        with open(path.join(code_dir, filename), "rb") as f:
+            h.update(f.read())
+    CACHED_RENDER_CODE_VERSION = h.hexdigest()
+    return CACHED_RENDER_CODE_VERSION
+
+def fingerprint_frames(dfs, extra=()):
+    """df[], str[] -> md5 hex digest of the frames' rows, columns and extra values"""
+    h = md5(get_render_code_version().encode())
+    for df in dfs:
+        h.update(",".join(str(col) for col in df.columns).encode())
+        h.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    for value in extra:
+        h.update(str(value).encode())
+    return h.hexdigest()
+
+def get_manifest_filepath(output_dir):
+    return path.join(output_dir, MANIFEST_FILENAME)
+
+def load_manifest(filepath):
+    """-> {report_name: fingerprint} from the last run, empty if there is none"""
+    try:
+        with open(filepath) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return {}
+
+def save_manifest(manifest, filepath):
+    tmp_filepath = filepath + ".tmp"
+    with open(tmp_filepath, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_filepath, filepath)
+
+def is_up_to_date(manifest, report_name, report_filepath, fingerprint):
+    return manifest.get(report_name) == fingerprint and path.isfile(report_filepath)
@@ -0,0 +1,97 @@
+"""Renders report HTML and PDFs with state shared across reports.
+
+A RenderContext owns the Jinja2 environment, the compiled report template
+and a PdfRenderer, which holds the parsed stylesheet and the font
+configuration WeasyPrint lays reports out with. Building them is slow
+compared with rendering one report, so get_render_context creates one per
+process, on first use, and every report reuses it. Compiled templates are
+also kept in a bytecode cache on disk, so new processes skip compiling them.
+
+The template renders a list of reports, one per page break, so several
+reports can be merged into one PDF with a single layout pass.
+
+Set GB_DEBUG_HTML_DIR (or run main.py with --debug-html DIR) to also save
+the HTML of every report there for inspection.
+"""
+import os
+import os.path as path
+import jinja2
+import weasyprint
+try:
+    from weasyprint.text.fonts import FontConfiguration
+except ImportError:
+    # weasyprint < 53
+    from weasyprint.fonts import FontConfiguration
+
+TEMPLATE_DIR = "templates"
+TEMPLATE_FILE = "gb_report_template.html"
+STYLESHEET_FILE = "./templates/typography.css"
+BYTECODE_CACHE_DIR = os.environ.get("GB_TEMPLATE_CACHE_DIR", "./cache/templates")
+DEBUG_HTML_DIR = os.environ.get("GB_DEBUG_HTML_DIR") or None
+
+class PdfRenderer:
+    """Writes HTML to PDF with one parsed stylesheet and font configuration."""
+
+    def __init__(self, stylesheet_file, base_url="./"):
+        self.base_url = base_url
+        self.font_config = FontConfiguration()
+        self.stylesheet = weasyprint.CSS(filename=stylesheet_file, font_config=self.font_config)
+
+    def write_pdf(self, html, output_path):
+        weasyprint.HTML(string=html, base_url=self.base_url).write_pdf(output_path,
+                                                                       stylesheets=[self.stylesheet],
+                                                                       font_config=self.font_config)
+
+class RenderContext:
+    """Jinja2 environment, compiled report template and PDF renderer."""
+
+    def __init__(self, template_dir, template_file, stylesheet_file, bytecode_cache_dir=None):
+        bytecode_cache = None
+        if bytecode_cache_dir is not None:
+            os.makedirs(bytecode_cache_dir, exist_ok=True)
+            bytecode_cache = jinja2.FileSystemBytecodeCache(bytecode_cache_dir)
+        self.env = jinja2.Environment(loader=jinja2.FileSystemLoader(template_dir),
+                                      bytecode_cache=bytecode_cache,
+                                      # the template doesn't change during a run
+                                      auto_reload=False)
+        self.template = self.env.get_template(template_file)
+        self.stylesheet_file = stylesheet_file
+        self.pdf_renderer = PdfRenderer(stylesheet_file)
+
+    def render_html(self, template_vars, link_stylesheet=False):
+        """Renders the report template for one report."""
+        return self.render_many_html([template_vars], template_vars["report_name"], link_stylesheet)
+
+    def render_many_html(self, template_vars_list, title, link_stylesheet=False):
+        """Renders the report template for several reports, each starting a new page.
+
+        The stylesheet is given to WeasyPrint already parsed, so it's only
+        linked from the HTML (link_stylesheet) for HTML viewed on its own.
+        """
+        stylesheet_href = None
+        if link_stylesheet:
+            stylesheet_href = "file://" + path.abspath(self.stylesheet_file)
+        return self.template.render(reports=template_vars_list, title=title, stylesheet_href=stylesheet_href)
+
+    def render_pdf(self, html, output_path):
+        self.pdf_renderer.write_pdf(html, output_path)
+
+    def save_debug_html(self, template_vars_list, title, debug_html_dir):
+        """Saves the HTML of the reports to debug_html_dir/<title>.html"""
+        os.makedirs(debug_html_dir, exist_ok=True)
+        debug_html_path = path.join(debug_html_dir, "{}.html".format(title))
+        with open(debug_html_path, "w") as f:
+            f.write(self.render_many_html(template_vars_list, title, link_stylesheet=True))
+
+CACHED_RENDER_CONTEXT = None
+def get_render_context():
+    """-> the RenderContext of this process, created on first use"""
+    global CACHED_RENDER_CONTEXT
+    if CACHED_RENDER_CONTEXT is None:
+        CACHED_RENDER_CONTEXT = RenderContext(TEMPLATE_DIR, TEMPLATE_FILE, STYLESHEET_FILE,
+                                              bytecode_cache_dir=BYTECODE_CACHE_DIR)
+    return CACHED_RENDER_CONTEXT
+
+def clear_render_context():
+    global CACHED_RENDER_CONTEXT
+    CACHED_RENDER_CONTEXT = None
@@ -0,0 +1,149 @@
+"""Letter grade charts drawn as hand-built SVG, without matplotlib.
+
+Same charts and functions as plots.py, for the "svg" chart backend: five
+bars coloured by letter grade, labelled with their counts. Importing this
+module doesn't import matplotlib, which takes about a second.
+"""
+import base64
+from xml.sax.saxutils import escape
+from gradeconvert import decode_scores, letter_grade_counts, LETTER_GRADES, LETTER_GRADE_COLORS
+
+# same layout as plots.py: rows of SPRITE_COLUMNS charts, each the size of
+# a 6.4 x 4.8 inch matplotlib figure at 100 dpi
+SPRITE_COLUMNS = 3
+CHART_WIDTH = 640
+CHART_HEIGHT = 480
+FONT_SIZE = 22
+FONT_FAMILY = "DejaVu Sans, sans-serif"
+# plot area inside a chart: (left, top, right, bottom)
+PLOT_AREA = (80, 60, 620, 420)
+BAR_WIDTH = 0.8
+NICE_STEPS = (1, 2, 5)
+MAX_Y_TICKS = 6
+
+def get_y_step(max_count):
+    """-> smallest of 1, 2, 5, 10, 20, 50... giving at most MAX_Y_TICKS ticks"""
+    magnitude = 1
+    while True:
+        for step in NICE_STEPS:
+            if max_count / (step * magnitude) < MAX_Y_TICKS:
+                return step * magnitude
+        magnitude *= 10
+
+def draw_lettergrade_bars(grade_counts, label=None, x=0, y=0):
+    """Returns the SVG elements of one chart, with its top left corner at (x, y).
+
+    Positional args:
+    grade_counts: int[5] of counts of ("A", "B", "C", "D", "F").
+
+    Keyword args:
+    label: str? -- title of the chart
+    x, y: number -- offset of the chart in the image
+
+    Returns:
+    str
+    """
+    grade_counts = [int(count) for count in grade_counts]
+    left, top, right, bottom = PLOT_AREA
+    y_step = get_y_step(max(max(grade_counts), 1))
+    y_max = y_step * (max(grade_counts) // y_step + 1)
+    slot_width = (right - left) / float(len(LETTER_GRADES))
+
+    def to_y(count):
+        return bottom - (bottom - top) * count / float(y_max)
+
+    elements = ['<g transform="translate({},{})">'.format(x, y)]
+    if label is not None:
+        elements.append('<text x="{}" y="{}" text-anchor="middle">{}</text>'.format(
+            (left + right) / 2.0, top - 20, escape(str(label))))
+    # y axis ticks
+    for count in range(0, y_max + 1, y_step):
+        elements.append('<line x1="{0}" y1="{1:.1f}" x2="{2}" y2="{1:.1f}" stroke="black"/>'.format(
+            left - 6, to_y(count), left))
+        elements.append('<text x="{}" y="{:.1f}" text-anchor="end" dominant-baseline="middle">{}</text>'.format(
+            left - 10, to_y(count), count))
+    # bars, with their letter below and their count above
+    for i, (letter, count) in enumerate(zip(LETTER_GRADES, grade_counts)):
+        bar_x = left + slot_width * (i + (1 - BAR_WIDTH) / 2.0)
+        center_x = left + slot_width * (i + 0.5)
+        elements.append('<rect x="{:.1f}" y="{:.1f}" width="{:.1f}" height="{:.1f}" fill="{}"/>'.format(
+            bar_x, to_y(count), slot_width * BAR_WIDTH, bottom - to_y(count), LETTER_GRADE_COLORS[letter]))
+        elements.append('<text x="{:.1f}" y="{:.1f}" text-anchor="middle">{}</text>'.format(
+            center_x, to_y(count) - 6, count))
+        elements.append('<text x="{:.1f}" y="{}" text-anchor="middle">{}</text>'.format(
+            center_x, bottom + FONT_SIZE + 8, letter))
+    # axes
+    elements.append('<polyline points="{0},{1} {0},{2} {3},{2}" fill="none" stroke="black"/>'.format(
+        left, top, bottom, right))
+    elements.append('</g>')
+    return "".join(elements)
+
+def create_svg(charts, width, height):
+    """str[] of chart elements -> SVG document"""
+    return ('<svg xmlns="http://www.w3.org/2000/svg" width="{0}" height="{1}" viewBox="0 0 {0} {1}" '
+            'font-family="{2}" font-size="{3}">'
+            '<rect width="100%" height="100%" fill="white"/>{4}</svg>').format(
+                width, height, FONT_FAMILY, FONT_SIZE, "".join(charts))
+
+def create_lettergrade_breakdown_diagram(**kwargs):
+    """Saves an SVG diagram of letter grade distribution for given grade data.
+
+    Keyword args:
+    grades: float[] -- list of percentage grades as floats.
+    letter_grade_counts: int[5]? -- (optional) counts of A, B, C, D and F,
+        eg a row of gbutils.get_lettergrade_histogram. Used instead of grades.
+    output_url: str -- valid url to save diagram to.
+    label: str? -- (optional) label for diagram
+
+    Returns:
+    (success: bool, err: Error | None)
+    """
+    grades = kwargs.get("grades", None)
+    grade_counts = kwargs.get("letter_grade_counts", None)
+    output_url = kwargs.get("output_url", None)
+    diagram_label = kwargs.get("label", None)
+
+    if grades is None and grade_counts is None:
+        raise ValueError("Missing required keyword argument grades")
+    if output_url is None:
+        raise ValueError("Missing required keyword argument output_url")
+
+    if grade_counts is None:
+        # count number of students with each grade
+        decoded_grades = decode_scores(grades, 100)
+        if decoded_grades.invalid_rows:
+            raise ValueError("Bad grades in rows {}".format(decoded_grades.invalid_rows))
+        grade_counts = letter_grade_counts(decoded_grades.percentages)
+
+    svg = create_svg([draw_lettergrade_bars(grade_counts, diagram_label)], CHART_WIDTH, CHART_HEIGHT)
+    try:
+        with open(output_url, "w") as f:
+            f.write(svg)
+        return (True, None)
+    except IOError as ioErr:
+        return (False, ioErr)
+
+def create_lettergrade_breakdown_sprite(grade_counts_by_subject, image_format="svg"):
+    """Draws the letter grade distribution of every subject as one SVG image.
+
+    Positional args:
+    grade_counts_by_subject: df -- subject x ("A", "B", "C", "D", "F") counts,
+        eg the output of gbutils.get_lettergrade_histogram with subjects.
+
+    Keyword args:
+    image_format: "svg" -- the only format this backend draws
+
+    Returns:
+    str -- data URI of the image, to use as an img src
+    """
+    if image_format != "svg":
+        raise ValueError("The svg chart backend can't draw {} sprites".format(image_format))
+
+    num_charts = max(len(grade_counts_by_subject), 1)
+    num_cols = min(num_charts, SPRITE_COLUMNS)
+    num_rows = -(-num_charts // num_cols)
+    charts = [draw_lettergrade_bars(grade_counts.values, subject_name,
+                                    x=CHART_WIDTH * (i % num_cols), y=CHART_HEIGHT * (i // num_cols))
+                for i, (subject_name, grade_counts) in enumerate(grade_counts_by_subject.iterrows())]
+    svg = create_svg(charts, CHART_WIDTH * num_cols, CHART_HEIGHT * num_rows)
+    return "data:image/svg+xml;base64,{}".format(base64.b64encode(svg.encode("utf-8")).decode("ascii"))
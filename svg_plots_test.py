@@ -0,0 +1,61 @@
+import unittest
+import base64
+import os
+import tempfile
+import xml.etree.ElementTree as ET
+import pandas as pd
+from svg_plots import create_lettergrade_breakdown_sprite, create_lettergrade_breakdown_diagram
+
+SVG_NS = "{http://www.w3.org/2000/svg}"
+
+def parse_data_uri(data_uri):
+    prefix = "data:image/svg+xml;base64,"
+    assert data_uri.startswith(prefix)
+    return ET.fromstring(base64.b64decode(data_uri[len(prefix):]))
+
+class CreateLettergradeBreakdownSprite(unittest.TestCase):
+
+    def setUp(self):
+        self.grade_counts_by_subject = pd.DataFrame([[3, 0, 1, 0, 2], [0, 0, 0, 0, 0], [7, 5, 3, 2, 1], [1, 1, 1, 1, 1]],
+                                                    columns=["A", "B", "C", "D", "F"],
+                                                    index=["MATHEMATICS STD", "SCIENCE & TECH", "WRITING STANDARDS", "PE"])
+
+    def test__should_draw_five_bars_per_subject(self):
+        svg = parse_data_uri(create_lettergrade_breakdown_sprite(self.grade_counts_by_subject))
+        charts = svg.findall(SVG_NS + "g")
+        self.assertEqual(len(charts), 4)
+        for chart in charts:
+            self.assertEqual(len(chart.findall(SVG_NS + "rect")), 5)
+
+    def test__should_label_charts_with_subject_and_counts(self):
+        svg = parse_data_uri(create_lettergrade_breakdown_sprite(self.grade_counts_by_subject))
+        texts = [text.text for text in svg.findall(SVG_NS + "g")[1].findall(SVG_NS + "text")]
+        self.assertIn("SCIENCE & TECH", texts)
+        texts = [text.text for text in svg.findall(SVG_NS + "g")[2].findall(SVG_NS + "text")]
+        for count in ("7", "5", "3", "2", "1"):
+            self.assertIn(count, texts)
+
+    def test__should_lay_out_charts_in_rows_of_three(self):
+        svg = parse_data_uri(create_lettergrade_breakdown_sprite(self.grade_counts_by_subject))
+        self.assertEqual(svg.get("width"), "1920")
+        self.assertEqual(svg.get("height"), "960")
+
+    def test__should_refuse_png(self):
+        with self.assertRaises(ValueError):
+            create_lettergrade_breakdown_sprite(self.grade_counts_by_subject, image_format="png")
+
+class CreateLettergradeBreakdownDiagram(unittest.TestCase):
+
+    def test__should_write_svg_file(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output_url = os.path.join(tmp_dir, "diagram.svg")
+            success, err = create_lettergrade_breakdown_diagram(grades=[95, 85, "Msg", 50.5],
+                                                                output_url=output_url,
+                                                                label="MATHEMATICS STD")
+            self.assertTrue(success)
+            self.assertIsNone(err)
+            svg = ET.parse(output_url).getroot()
+            self.assertEqual(len(svg.findall(SVG_NS + "g")[0].findall(SVG_NS + "rect")), 5)
+
+if __name__ == "__main__":
+    unittest.main()
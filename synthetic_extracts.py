@@ -0,0 +1,219 @@
+"""Generates synthetic gradebook extracts for benchmarking.
+
+Writes the four source CSVs data_access reads, with the columns it reads
+and the quirks of the real extracts: class names closing the homeroom with
+']' instead of ')', Msg/Exc/Inc/blank and letter grade scores, extra credit
+scores above ScorePossible, category weights that don't add up to 100 and
+unused categories (some sharing a name with a used category).
+
+One school has teachers_per_school teachers, each with their own homeroom
+of students_per_homeroom students, teaching the five main subjects plus one
+non-main subject. Every class has assignments_per_class assignments.
+"""
+import os
+import os.path as path
+import argparse
+import numpy as np
+import pandas as pd
+from enums import Cols, GradeCodes
+import data_access
+
+MAIN_SUBJECTS = (
+    "CHGO READING FRMWK",
+    "MATHEMATICS STD",
+    "SCIENCE  STANDARDS",
+    "SOCIAL SCIENCE STD",
+    "WRITING STANDARDS",
+)
+OTHER_SUBJECTS = ("PHYSICAL EDUCATION",)
+SUBJECTS = MAIN_SUBJECTS + OTHER_SUBJECTS
+
+CATEGORY_NAMES = ("Homework", "Classwork", "Assessments", "Projects")
+CATEGORY_WEIGHTS = (20, 30, 40, 10)
+UNUSED_CATEGORY_NAME = "Participation"
+SCORE_POSSIBLES = (10, 20, 25, 100)
+
+# share of student assignments with each special score
+SCORE_CODE_RATES = {
+    GradeCodes.Missing.value: 0.03,
+    GradeCodes.Excused.value: 0.02,
+    GradeCodes.Incomplete.value: 0.01,
+    "": 0.03,
+}
+LETTER_SCORE_RATE = 0.01
+EXTRA_CREDIT_RATE = 0.005
+# share of classes with each quirk
+BRACKET_QUIRK_RATE = 0.02
+BAD_WEIGHTS_RATE = 0.05
+UNUSED_CATEGORY_RATE = 0.2
+REUSED_UNUSED_CATEGORY_RATE = 0.02
+
+QUARTER_START = pd.Timestamp("2018-04-02")
+QUARTER_DAYS = 42
+
+def get_class_names(subjects, homerooms, rng):
+    """str[], str[] -> "SUBJECT (HOMEROOM)" names, some closed with ']'"""
+    class_names = pd.Series(subjects) + " (" + pd.Series(homerooms)
+    closing = np.where(rng.random(len(class_names)) < BRACKET_QUIRK_RATE, "]", ")")
+    return (class_names + closing).values
+
+def generate_extracts(extract_dir, num_schools=1, teachers_per_school=30,
+                      students_per_homeroom=28, assignments_per_class=40, seed=0):
+    """Writes the four source extracts to extract_dir.
+
+    Returns:
+    {filename: number of rows written}
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(extract_dir, exist_ok=True)
+
+    # teachers: one homeroom each
+    num_teachers = num_schools * teachers_per_school
+    teacher_schools = np.arange(num_teachers) // teachers_per_school
+    teacher_numbers = np.arange(num_teachers) % teachers_per_school
+    teacher_first = np.array(["Teacher{}".format(t) for t in teacher_numbers], dtype=object)
+    teacher_last = np.array(["School{:03d}".format(s) for s in teacher_schools], dtype=object)
+    # class names are "SUBJECT (HOMEROOM)" and assignments are told apart by
+    # class name, so homerooms are numbered district-wide
+    homerooms = np.array(["{}{}".format("AB"[t % 2], 101 + t) for t in range(num_teachers)], dtype=object)
+    school_ids = np.array([str(400000 + s) for s in teacher_schools], dtype=object)
+
+    # classes: every teacher teaches every subject to their homeroom
+    num_classes = num_teachers * len(SUBJECTS)
+    class_teachers = np.arange(num_classes) // len(SUBJECTS)
+    class_subjects = np.array(SUBJECTS, dtype=object)[np.arange(num_classes) % len(SUBJECTS)]
+    class_names = get_class_names(class_subjects, homerooms[class_teachers], rng)
+    # category weights, some of which don't add up to 100
+    class_weights = np.tile(np.array(CATEGORY_WEIGHTS, dtype=float), (num_classes, 1))
+    bad_weights = rng.random(num_classes) < BAD_WEIGHTS_RATE
+    class_weights[bad_weights, 0] += rng.choice((-10, 10), bad_weights.sum())
+
+    # students
+    num_students = num_teachers * students_per_homeroom
+    student_teachers = np.arange(num_students) // students_per_homeroom
+    student_ids = np.array([str(50000000 + s) for s in range(num_students)], dtype=object)
+    student_first = np.array(["Student{}".format(s % students_per_homeroom) for s in range(num_students)], dtype=object)
+    student_last = teacher_last[student_teachers]
+
+    # assignments
+    num_assignments = num_classes * assignments_per_class
+    assignment_classes = np.arange(num_assignments) // assignments_per_class
+    assignment_names = np.array(["Assignment {}".format(a % assignments_per_class + 1)
+                                    for a in range(num_assignments)], dtype=object)
+    assignment_categories = rng.integers(0, len(CATEGORY_NAMES), num_assignments)
+    assignment_possibles = rng.choice(SCORE_POSSIBLES, num_assignments)
+    due_dates = QUARTER_START + pd.to_timedelta(rng.integers(0, QUARTER_DAYS, num_assignments), unit="D")
+    entered_dates = due_dates + pd.to_timedelta(rng.integers(0, 7, num_assignments), unit="D")
+    assigned_dates = due_dates - pd.to_timedelta(rng.integers(1, 7, num_assignments), unit="D")
+
+    # student assignments: every student of the homeroom gets every assignment
+    num_rows = num_assignments * students_per_homeroom
+    row_assignments = np.repeat(np.arange(num_assignments), students_per_homeroom)
+    row_classes = assignment_classes[row_assignments]
+    row_teachers = class_teachers[row_classes]
+    row_students = row_teachers * students_per_homeroom + np.tile(np.arange(students_per_homeroom), num_assignments)
+    row_possibles = assignment_possibles[row_assignments]
+    # scores: mostly numeric, skewed towards passing
+    scores = np.round(row_possibles * rng.beta(5, 1.5, num_rows)).astype(int)
+    extra_credit = rng.random(num_rows) < EXTRA_CREDIT_RATE
+    scores[extra_credit] = row_possibles[extra_credit] + rng.integers(1, 5, extra_credit.sum())
+    row_scores = scores.astype(str).astype(object)
+    draws = rng.random(num_rows)
+    threshold = 0.0
+    for code, rate in SCORE_CODE_RATES.items():
+        row_scores[(draws >= threshold) & (draws < threshold + rate)] = code
+        threshold += rate
+    letters = (draws >= threshold) & (draws < threshold + LETTER_SCORE_RATE)
+    row_scores[letters] = rng.choice(list("ABCDF"), letters.sum())
+
+    date_format = "%m/%d/%Y"
+    assignments_df = pd.DataFrame({
+        Cols.StudentLastname.value: student_last[row_students],
+        Cols.StudentFirstname.value: student_first[row_students],
+        Cols.StudentId.value: student_ids[row_students],
+        Cols.GradeLevel.value: "5",
+        Cols.ClassName.value: class_names[row_classes],
+        Cols.TeacherLastname.value: teacher_last[row_teachers],
+        Cols.TeacherFirstname.value: teacher_first[row_teachers],
+        Cols.AssignmentName.value: assignment_names[row_assignments],
+        Cols.Score.value: row_scores,
+        Cols.ScorePossible.value: row_possibles,
+        Cols.CategoryName.value: np.array(CATEGORY_NAMES, dtype=object)[assignment_categories[row_assignments]],
+        Cols.CategoryWeight.value: class_weights[row_classes, assignment_categories[row_assignments]],
+        Cols.AssignmentDue.value: due_dates.strftime(date_format).values[row_assignments],
+        Cols.AssignedDate.value: assigned_dates.strftime(date_format).values[row_assignments],
+        Cols.GradeEnteredOn.value: entered_dates.strftime(date_format).values[row_assignments],
+        Cols.SchoolId.value: school_ids[row_teachers],
+    })
+
+    # cumulative grades: one quarter average per student per subject
+    grade_students = np.repeat(np.arange(num_students), len(SUBJECTS))
+    grade_subjects = np.tile(np.array(SUBJECTS, dtype=object), num_students)
+    quarter_avgs = np.round(100 * rng.beta(5, 1.5, len(grade_students)), 2).astype(str).astype(object)
+    quarter_avgs[rng.random(len(grade_students)) < SCORE_CODE_RATES[""]] = ""
+    grade_teachers = student_teachers[grade_students]
+    grade_df = pd.DataFrame({
+        "SchoolID": school_ids[grade_teachers],
+        "StudentID": student_ids[grade_students],
+        "StudentFirstName": student_first[grade_students],
+        "StudentLastName": student_last[grade_students],
+        "StudentHomeroom": homerooms[grade_teachers],
+        "SubjectName": grade_subjects,
+        "TeacherFirstName": teacher_first[grade_teachers],
+        "TeacherLastName": teacher_last[grade_teachers],
+        "QuarterAvg": quarter_avgs,
+    })
+
+    # categories: every category of every class
+    category_classes = np.repeat(np.arange(num_classes), len(CATEGORY_NAMES))
+    category_indexes = np.tile(np.arange(len(CATEGORY_NAMES)), num_classes)
+    categories_df = pd.DataFrame({
+        "SchoolID": school_ids[class_teachers[category_classes]],
+        "TeacherFirstName": teacher_first[class_teachers[category_classes]],
+        "TeacherLastName": teacher_last[class_teachers[category_classes]],
+        "ClassName": class_names[category_classes],
+        "CategoryName": np.array(CATEGORY_NAMES, dtype=object)[category_indexes],
+        "CategoryWeight": class_weights[category_classes, category_indexes],
+    })
+
+    # unused categories: some classes have one, sometimes named like a used one
+    unused_classes = np.flatnonzero(rng.random(num_classes) < UNUSED_CATEGORY_RATE)
+    unused_names = np.where(rng.random(len(unused_classes)) < REUSED_UNUSED_CATEGORY_RATE,
+                            CATEGORY_NAMES[0], UNUSED_CATEGORY_NAME)
+    unused_cats_df = pd.DataFrame({
+        "Teacher First": teacher_first[class_teachers[unused_classes]],
+        "Teacher Last": teacher_last[class_teachers[unused_classes]],
+        "Class Name": class_names[unused_classes],
+        "Unused Category": unused_names,
+        "Category Weight": 10,
+        "Total Class Assignments": assignments_per_class,
+    })
+
+    extracts = {
+        data_access.GRADE_DATA_FILENAME: grade_df,
+        data_access.ASSIGNMENT_DATA_FILENAME: assignments_df,
+        data_access.CATEGORY_DATA_FILENAME: categories_df,
+        data_access.UNUSED_CATS_FILENAME: unused_cats_df,
+    }
+    for filename, df in extracts.items():
+        df.to_csv(path.join(extract_dir, filename), index=False)
+    return {filename: len(df) for filename, df in extracts.items()}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic gradebook extracts.")
+    parser.add_argument("extract_dir", help="directory to write the four CSVs to, eg ./source/synthetic")
+    parser.add_argument("--schools", type=int, default=1)
+    parser.add_argument("--teachers-per-school", type=int, default=30)
+    parser.add_argument("--students-per-homeroom", type=int, default=28)
+    parser.add_argument("--assignments-per-class", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    row_counts = generate_extracts(args.extract_dir,
+                                   num_schools=args.schools,
+                                   teachers_per_school=args.teachers_per_school,
+                                   students_per_homeroom=args.students_per_homeroom,
+                                   assignments_per_class=args.assignments_per_class,
+                                   seed=args.seed)
+    for filename, num_rows in row_counts.items():
+        print("{}: {} rows".format(filename, num_rows))
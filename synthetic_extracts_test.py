@@ -0,0 +1,46 @@
+import unittest
+import tempfile
+import os.path as path
+import data_access
+import extract_cache
+from synthetic_extracts import generate_extracts, MAIN_SUBJECTS
+
+class GenerateExtracts(unittest.TestCase):
+
+    teachers_per_school = 3
+    assignments_per_class = 4
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        generate_extracts(path.join(self.tmp_dir.name, "synthetic"),
+                          num_schools=2,
+                          teachers_per_school=self.teachers_per_school,
+                          students_per_homeroom=5,
+                          assignments_per_class=self.assignments_per_class)
+        self.saved_settings = (data_access.SOURCE_DIR, data_access.DATE, extract_cache.ENABLED)
+        data_access.SOURCE_DIR = self.tmp_dir.name
+        data_access.DATE = "synthetic"
+        extract_cache.ENABLED = False
+        data_access.clear_caches()
+
+    def tearDown(self):
+        data_access.SOURCE_DIR, data_access.DATE, extract_cache.ENABLED = self.saved_settings
+        data_access.clear_caches()
+        self.tmp_dir.cleanup()
+
+    def test__should_be_loadable_by_data_access(self):
+        self.assertFalse(data_access.get_grade_df().empty)
+        self.assertFalse(data_access.get_categories_df().empty)
+        self.assertFalse(data_access.get_unused_cats_df().empty)
+
+    def test__should_keep_only_main_subject_assignments(self):
+        assignments_df = data_access.get_assignments_df()
+        num_classes = 2 * self.teachers_per_school * len(MAIN_SUBJECTS)
+        self.assertEqual(len(assignments_df), num_classes * self.assignments_per_class)
+
+    def test__should_have_one_report_per_teacher(self):
+        partitions = data_access.get_report_partitions()
+        self.assertEqual(len(partitions.keys()), 2 * self.teachers_per_school)
+
+if __name__ == "__main__":
+    unittest.main()